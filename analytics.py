@@ -1,45 +1,172 @@
 # analytics.py
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
-from models import Sale, Product, db
+import json
+from models import SalesRollup, Product, User, db
 from sqlalchemy import func
+from auth.routes import login_required, role_required
 
 analytics_bp = Blueprint('analytics', __name__)
 
 @analytics_bp.route('/analytics')
 def dashboard():
+    # Todo se lee de sales_rollup (una fila por hora/producto/usuario),
+    # no de la tabla de ventas completa
     # KPIs principales
-    total_sales = db.session.query(func.sum(Sale.total)).scalar() or 0
+    total_sales = db.session.query(func.sum(SalesRollup.revenue)).scalar() or 0
     top_products = db.session.query(
         Product.name,
-        func.sum(Sale.quantity).label('total_sold')
-    ).join(Sale).group_by(Product.name).order_by(func.sum(Sale.quantity).desc()).limit(5).all()
+        func.sum(SalesRollup.quantity).label('total_sold')
+    ).join(SalesRollup, SalesRollup.product_id == Product.id).group_by(Product.name).order_by(func.sum(SalesRollup.quantity).desc()).limit(5).all()
 
     # Ventas semanales/mensuales
     today = datetime.utcnow().date()
     last_week = today - timedelta(days=7)
     last_month = today - timedelta(days=30)
 
-    weekly_sales = Sale.query.filter(
-        Sale.date >= last_week
-    ).all()
-
-    monthly_sales = Sale.query.filter(
-        Sale.date >= last_month
-    ).all()
-
-    # Formatear datos para Chart.js
-    def prepare_chart_data(sales):
-        dates = sorted({sale.date.strftime('%Y-%m-%d') for sale in sales})
-        amounts = [sum(sale.total for sale in sales if sale.date.strftime('%Y-%m-%d') == date) for date in dates]
+    # Formatear datos para Chart.js (agrupado por día en SQL)
+    def prepare_chart_data(since):
+        day = func.strftime('%Y-%m-%d', SalesRollup.bucket_hour)
+        rows = db.session.query(
+            day, func.sum(SalesRollup.revenue)
+        ).filter(
+            SalesRollup.bucket_hour >= since
+        ).group_by(day).order_by(day).all()
         return {
-            'labels': dates,
-            'data': amounts
+            'labels': [date for date, _ in rows],
+            'data': [amount for _, amount in rows]
         }
 
     return render_template('modules/analytics/analytics.html',
         total_sales=total_sales,
         top_products=top_products,
-        weekly_data=prepare_chart_data(weekly_sales),
-        monthly_data=prepare_chart_data(monthly_sales)
-    )
\ No newline at end of file
+        weekly_data=prepare_chart_data(last_week),
+        monthly_data=prepare_chart_data(last_month)
+    )
+
+# ===== API de consultas (JSON listo para Chart.js) =====
+
+# Formato strftime de cada granularidad; el mismo formato sirve en SQLite y en Python
+GRANULARITIES = {
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+}
+DIMENSIONS = {
+    'product': lambda: Product.name,
+    'user': lambda: User.username,
+    'unit_measure': lambda: Product.unit_measure,
+}
+METRICS = {
+    'revenue': lambda: func.sum(SalesRollup.revenue),
+    'quantity': lambda: func.sum(SalesRollup.quantity),
+    'count': lambda: func.sum(SalesRollup.sale_count),
+}
+MAX_BUCKETS = 2000      # etiquetas máximas en el eje X
+MAX_SERIES = 25         # series (productos, usuarios...) máximas por gráfico
+DEFAULT_SERIES = 10
+
+def bucket_labels(start, end, granularity):
+    """Etiquetas del eje X entre start y end (exclusivo), incluyendo periodos sin ventas."""
+    fmt = GRANULARITIES[granularity]
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    labels = []
+    current = start
+    while current < end:
+        label = current.strftime(fmt)
+        if not labels or labels[-1] != label:
+            labels.append(label)
+            if len(labels) > MAX_BUCKETS:
+                break
+        current += step
+    return labels
+
+def parse_query_args(args):
+    today = datetime.utcnow().date()
+    try:
+        start = datetime.strptime(args.get('start', ''), '%Y-%m-%d') if args.get('start') \
+            else datetime.combine(today - timedelta(days=29), datetime.min.time())
+        end = datetime.strptime(args.get('end', ''), '%Y-%m-%d') if args.get('end') \
+            else datetime.combine(today, datetime.min.time())
+    except ValueError:
+        raise ValueError('Fechas inválidas, use el formato YYYY-MM-DD')
+    end += timedelta(days=1)  # el día final se incluye completo
+    if end <= start:
+        raise ValueError('La fecha final debe ser posterior a la inicial')
+
+    granularity = args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Granularidad no válida: {granularity}')
+    dimension = args.get('dimension') or None
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise ValueError(f'Dimensión no válida: {dimension}')
+    metric = args.get('metric', 'revenue')
+    if metric not in METRICS:
+        raise ValueError(f'Métrica no válida: {metric}')
+    limit = min(max(args.get('limit', DEFAULT_SERIES, type=int), 1), MAX_SERIES)
+    return start, end, granularity, dimension, metric, limit
+
+def series_query(start, end, granularity, dimension, metric):
+    bucket = func.strftime(GRANULARITIES[granularity], SalesRollup.bucket_hour)
+    key = DIMENSIONS[dimension]() if dimension else db.literal('Total')
+    query = db.session.query(key.label('series'), bucket.label('bucket'), METRICS[metric]().label('value'))
+    if dimension == 'user':
+        query = query.join(User, User.id == SalesRollup.user_id)
+    elif dimension:
+        query = query.join(Product, Product.id == SalesRollup.product_id)
+    return query.filter(
+        SalesRollup.bucket_hour >= start, SalesRollup.bucket_hour < end
+    ), key, bucket
+
+@analytics_bp.route('/api/sales')
+@login_required
+@role_required('admin')
+def api_sales_series():
+    """
+    Serie agregada de ventas: ?start=&end=&granularity=hour|day|week|month
+    &dimension=product|user|unit_measure&metric=revenue|quantity|count&limit=N
+    """
+    try:
+        start, end, granularity, dimension, metric, limit = parse_query_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    labels = bucket_labels(start, end, granularity)
+    if len(labels) > MAX_BUCKETS:
+        return jsonify({
+            'success': False,
+            'message': f'Demasiados periodos (máximo {MAX_BUCKETS}); reduzca el rango o use una granularidad mayor'
+        }), 400
+
+    query, key, bucket = series_query(start, end, granularity, dimension, metric)
+
+    # Solo las N series con mayor valor en el rango
+    top_series = [row[0] for row in query.with_entities(key)
+                  .group_by(key).order_by(METRICS[metric]().desc()).limit(limit).all()]
+    rows = query.filter(key.in_(top_series)) if dimension else query
+    rows = rows.group_by(key, bucket).order_by(key, bucket) \
+        .execution_options(stream_results=True).yield_per(500)
+
+    positions = {label: index for index, label in enumerate(labels)}
+
+    def generate():
+        # Se envía una serie cada vez para no construir toda la respuesta en memoria
+        yield json.dumps({
+            'success': True, 'granularity': granularity, 'dimension': dimension,
+            'metric': metric, 'labels': labels
+        })[:-1] + ', "datasets": ['
+        current, data, first = None, None, True
+        for series, label, value in rows:
+            if series != current:
+                if current is not None:
+                    yield ('' if first else ', ') + json.dumps({'label': current, 'data': data})
+                    first = False
+                current, data = series, [0] * len(labels)
+            if label in positions:
+                data[positions[label]] = value or 0
+        if current is not None:
+            yield ('' if first else ', ') + json.dumps({'label': current, 'data': data})
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
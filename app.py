@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template, session
+# Fábrica de la aplicación. Importar este módulo no toca la base de datos: el
+# esquema y el usuario admin se crean con `flask init-db`, y las dependencias
+# pesadas (reportlab, openpyxl, Flask-Migrate/alembic) se importan solo cuando
+# se usan. Con gunicorn:
+#
+#   gunicorn -c gunicorn.conf.py          # --preload y 'app:create_app()'
 import os
-from models import db, init_db
+import click
+from flask import Flask, render_template, session
+from models import db, init_db_command
 from auth.routes import auth_bp, login_required
 from sales.routes import sales_bp
 from inventory.routes import inventory_bp
@@ -11,61 +18,117 @@ from users.routes import users_bp
 from cash_register.routes import cash_register_bp
 from settings.routes import settings_bp
 from analytics import analytics_bp
-from flask_migrate import Migrate  # Nueva importación
+from reports.routes import reports_bp
+from database import configure_sqlite, apply_sqlite_pragmas
+from metrics import init_metrics
+from query_plans import check_query_plans_command
+from sales.rollup import rebuild_rollup_command
+from sales.close import close_day_command
+from inventory.catalog import import_products_command, export_products_command
 
-app = Flask(__name__)
-app.secret_key = 'tu_clave_secreta_aqui_12345'
+basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Registrar blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(sales_bp)
-app.register_blueprint(inventory_bp)
-app.register_blueprint(crm_bp)
-app.register_blueprint(maintenance_bp)
-app.register_blueprint(users_bp)
-app.register_blueprint(cash_register_bp)
-app.register_blueprint(settings_bp)
-app.register_blueprint(analytics_bp, url_prefix='/analytics')
+def default_config():
+    database = os.path.join(basedir, 'erp.db')
+    return {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Sello compartido entre workers para la caché de ajustes (settings/cache.py)
+        'SETTINGS_VERSION_FILE': database + '.settings-version',
+        # Reportes PDF en segundo plano (reports/jobs.py)
+        'REPORT_CACHE_DIR': os.path.join(basedir, 'report_cache'),
+        'REPORT_WORKERS': 2,
+        # Sello compartido para invalidar permisos de usuario (auth/permissions.py)
+        'PERMISSIONS_VERSION_FILE': database + '.permissions-version',
+        # Commit agrupado de ventas (sales/group_commit.py): SALES_GROUP_COMMIT=1 lo activa
+        'SALES_GROUP_COMMIT': os.environ.get('SALES_GROUP_COMMIT') == '1',
+        'SALES_GROUP_COMMIT_WINDOW_MS': float(os.environ.get('SALES_GROUP_COMMIT_WINDOW_MS', 5)),
+        'SALES_GROUP_COMMIT_MAX_BATCH': 64,
+        # Métricas por endpoint (metrics.py): archivos por worker y /metrics.
+        # METRICS_SERVER_TIMING=1 añade la cabecera Server-Timing; con METRICS_TOKEN,
+        # /metrics pide "Authorization: Bearer <token>" (o una sesión de admin);
+        # sin él solo responde a peticiones desde localhost (403 para el resto)
+        'METRICS_DIR': database + '.metrics',
+        'METRICS_SERVER_TIMING': os.environ.get('METRICS_SERVER_TIMING') == '1',
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        # Flask-Migrate (`flask db ...`): None = solo desde la línea de comandos
+        'MIGRATIONS': None,
+    }
 
-# Database Configuration
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'erp.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_recycle': 300,
-    'pool_pre_ping': True
-}
+def create_app(config=None):
+    """
+    Crea la aplicación. `config` (dict) se aplica sobre la configuración por
+    defecto, antes de preparar SQLite; sirve para bases temporales o benchmarks.
+    """
+    app = Flask(__name__)
+    app.secret_key = 'tu_clave_secreta_aqui_12345'
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.from_mapping(config)
+
+    # Perfil SQLite (WAL, busy_timeout, etc.). Se elige con SQLITE_PROFILE=production|default
+    configure_sqlite(app)
+    # Solo crea el motor y registra los pragmas: no abre conexiones, así con
+    # --preload el proceso maestro no deja conexiones abiertas a los workers
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(app, db)
+    init_metrics(app)
 
-# Initialize Database
-db.init_app(app)
+    register_blueprints(app)
+    register_commands(app)
+    app.context_processor(inject_settings)
+    app.add_url_rule('/', 'dashboard', dashboard)
+    return app
 
-# Configurar Flask-Migrate
-migrate = Migrate(app, db)
+def register_blueprints(app):
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(sales_bp)
+    app.register_blueprint(inventory_bp)
+    app.register_blueprint(crm_bp)
+    app.register_blueprint(maintenance_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(cash_register_bp)
+    app.register_blueprint(settings_bp)
+    app.register_blueprint(analytics_bp, url_prefix='/analytics')
+    app.register_blueprint(reports_bp)
 
-# Initialize Database (crear tablas si no existen)
-with app.app_context():
-    init_db(app)
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(rebuild_rollup_command)
+    app.cli.add_command(close_day_command)
+    app.cli.add_command(import_products_command)
+    app.cli.add_command(export_products_command)
+
+    # Flask-Migrate importa alembic (~0,2 s): solo se registra si la aplicación
+    # se crea desde el comando `flask` o con MIGRATIONS=True
+    migrations = app.config['MIGRATIONS']
+    if migrations is None:
+        migrations = click.get_current_context(silent=True) is not None
+    if migrations:
+        from flask_migrate import Migrate
+        # render_as_batch: SQLite no soporta ALTER TABLE completo
+        Migrate(app, db, render_as_batch=True)
+
+def warm_up(app):
+    """
+    Compila las plantillas por adelantado. Con gunicorn --preload se llama en
+    el proceso maestro (gunicorn.conf.py) y los workers heredan la caché de Jinja.
+    """
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
 
 # Context Processor para hacer disponibles los settings en todas las plantillas
-@app.context_processor
 def inject_settings():
-    from models import SystemSettings
+    from settings.cache import cached_settings
     try:
-        settings = SystemSettings.get_settings()
+        settings = cached_settings()
         return dict(settings=settings, show_cash_register=False)  # ← Valor por defecto
     except:
         # Si hay algún error (tabla no existe, etc.), retornar valores por defecto
         return dict(settings=None, show_cash_register=False)  # ← Valor por defecto
 
-# Función para obtener settings en las rutas
-def get_system_settings():
-    from models import SystemSettings
-    try:
-        return SystemSettings.get_settings()
-    except:
-        return None
-
-@app.route('/')
 @login_required
 def dashboard():
     modules = []
@@ -91,4 +154,4 @@ def dashboard():
     return render_template('dashboard/dashboard.html', modules=modules)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
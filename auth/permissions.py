@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+from flask import current_app, session
+from models import db, User, DataVersion
+from stamps import read_stamp, write_stamp
+
+# La sesión de Flask es una cookie firmada con app.secret_key: el rol y la versión
+# de permisos guardados en el login no se pueden alterar desde el cliente.
+# Cada usuario tiene una versión en data_version ('user:<id>'); al borrarlo o
+# cambiarle el rol se incrementa y las sesiones con la versión anterior caducan.
+# Cada worker guarda las versiones en un LRU que se vacía cuando cambia el sello
+# compartido PERMISSIONS_VERSION_FILE, así en condiciones normales no hay consultas.
+LRU_SIZE = 1024
+
+_lock = threading.Lock()
+_versions = OrderedDict()
+_state = {'stamp': None}
+
+def _version_key(user_id):
+    return f'user:{user_id}'
+
+def _version_file():
+    return current_app.config.get('PERMISSIONS_VERSION_FILE')
+
+def permission_version(user_id):
+    stamp = read_stamp(_version_file())
+    if stamp is None:
+        return DataVersion.current(_version_key(user_id))
+    with _lock:
+        if stamp != _state['stamp']:
+            _versions.clear()
+            _state['stamp'] = stamp
+        if user_id in _versions:
+            _versions.move_to_end(user_id)
+            return _versions[user_id]
+    version = DataVersion.current(_version_key(user_id))
+    with _lock:
+        if stamp == _state['stamp']:
+            _versions[user_id] = version
+            while len(_versions) > LRU_SIZE:
+                _versions.popitem(last=False)
+    return version
+
+def grant_session(user):
+    """Guarda en la sesión los datos de autorización del usuario (login)."""
+    session['user_id'] = user.id
+    session['username'] = user.username
+    session['role'] = user.role
+    session['perm_version'] = permission_version(user.id)
+
+def session_is_current():
+    """
+    True si la sesión sigue siendo válida. Las sesiones anteriores a este
+    mecanismo (sin perm_version) se validan una vez contra la tabla de usuarios.
+    """
+    user_id = session['user_id']
+    if 'perm_version' not in session:
+        user = User.query.get(user_id)
+        if user is None:
+            return False
+        grant_session(user)
+        return True
+    return session['perm_version'] == permission_version(user_id)
+
+def revoke_user_permissions(user_id):
+    """
+    Llamar después de borrar un usuario o cambiar su rol: invalida sus
+    sesiones abiertas en todos los workers.
+    """
+    DataVersion.bump(_version_key(user_id))
+    db.session.commit()
+    with _lock:
+        _versions.pop(user_id, None)
+    write_stamp(_version_file(), DataVersion.current(_version_key(user_id)))
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models import User, db
 from functools import wraps
+from auth.permissions import grant_session, session_is_current
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -10,6 +11,10 @@ def login_required(f):
         if 'user_id' not in session:
             flash('Por favor inicie sesión primero', 'danger')
             return redirect(url_for('auth.login'))
+        if not session_is_current():
+            session.clear()
+            flash('Su sesión ha caducado, inicie sesión de nuevo', 'danger')
+            return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -20,8 +25,12 @@ def role_required(role):
             if 'user_id' not in session:
                 flash('Por favor inicie sesión primero', 'danger')
                 return redirect(url_for('auth.login'))
-            user = User.query.get(session['user_id'])
-            if user.role != role:
+            # El rol sale de la sesión firmada; su versión se valida sin consultar la tabla de usuarios
+            if not session_is_current():
+                session.clear()
+                flash('Su sesión ha caducado, inicie sesión de nuevo', 'danger')
+                return redirect(url_for('auth.login'))
+            if session.get('role') != role:
                 flash('No tiene permisos para acceder a esta página', 'danger')
                 return redirect(url_for('dashboard'))
             return f(*args, **kwargs)
@@ -36,9 +45,7 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password):
-            session['user_id'] = user.id
-            session['username'] = user.username
-            session['role'] = user.role
+            grant_session(user)
             flash('Inicio de sesión exitoso', 'success')
             return redirect(url_for('dashboard'))
         else:
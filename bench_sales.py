@@ -0,0 +1,123 @@
+# bench_sales.py
+# Benchmark del registro de ventas con y sin commit agrupado (sales/group_commit.py).
+# Crea una base SQLite temporal con el mismo esquema y perfil que la aplicación,
+# lanza N hilos que venden en paralelo (como los hilos de un worker de gunicorn)
+# e imprime ventas por segundo y latencias. No toca erp.db.
+#
+#   python bench_sales.py --threads 16 --sales 4000
+#   python bench_sales.py --synchronous FULL      # un fsync por commit
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from flask import Flask
+from models import db, User, Product, Sale
+from database import configure_sqlite, apply_sqlite_pragmas
+from sales.group_commit import sell_cart, get_writer
+
+PRODUCTS = 50
+
+def scratch_app(path, group_commit, window_ms, max_batch, synchronous):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(path, 'bench.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SETTINGS_VERSION_FILE'] = os.path.join(path, 'settings-version')
+    app.config['SQLITE_PROFILE'] = 'production'
+    if synchronous:
+        app.config['SQLITE_PRAGMAS'] = {'synchronous': synchronous}
+    app.config['SALES_GROUP_COMMIT'] = group_commit
+    app.config['SALES_GROUP_COMMIT_WINDOW_MS'] = window_ms
+    app.config['SALES_GROUP_COMMIT_MAX_BATCH'] = max_batch
+    configure_sqlite(app)
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(app, db)
+        db.create_all()
+        user = User(username='bench', role='admin')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.add_all([
+            Product(name=f'Producto {i}', quantity=10 ** 9, price=1.5, daily_sales=0)
+            for i in range(PRODUCTS)
+        ])
+        db.session.commit()
+    return app
+
+def run(app, threads, sales):
+    with app.app_context():
+        user_id = User.query.first().id
+    per_thread = sales // threads
+    latencies = []
+    errors = []
+    start = threading.Barrier(threads + 1)
+
+    def seller(offset):
+        local = []
+        with app.app_context():
+            start.wait()
+            for i in range(per_thread):
+                product_id = 1 + (offset + i) % PRODUCTS
+                began = time.perf_counter()
+                try:
+                    sell_cart([{'product_id': product_id, 'quantity': 1}], user_id, 'Bench')
+                except Exception as e:
+                    errors.append(e)
+                local.append(time.perf_counter() - began)
+                db.session.remove()
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=seller, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    return elapsed, sorted(latencies), errors
+
+def report(label, app, elapsed, latencies, errors):
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    line = (f'{label:<22} {len(latencies) / elapsed:8.0f} ventas/s   '
+            f'p50 {percentile(0.50):6.2f} ms   p99 {percentile(0.99):6.2f} ms   '
+            f'media {statistics.mean(latencies) * 1000:6.2f} ms')
+    writer = app.extensions.get('sales_group_commit')
+    if writer:
+        line += f'   {writer[0].carts / max(writer[0].batches, 1):.1f} ventas/commit'
+    if errors:
+        line += f'   {len(errors)} errores ({errors[0]})'
+    with app.app_context():
+        recorded = db.session.query(db.func.count(Sale.id)).scalar()
+    if recorded != len(latencies) - len(errors):
+        line += f'   ¡{recorded} ventas guardadas de {len(latencies) - len(errors)}!'
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Ventas por segundo con y sin commit agrupado')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--sales', type=int, default=4000)
+    parser.add_argument('--window-ms', type=float, default=5)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--synchronous', choices=['OFF', 'NORMAL', 'FULL'], default=None,
+                        help='PRAGMA synchronous (por defecto, el del perfil production)')
+    args = parser.parse_args()
+
+    print(f'{args.sales} ventas, {args.threads} hilos, ventana {args.window_ms} ms, '
+          f'synchronous {args.synchronous or "NORMAL"}')
+    for label, group_commit in (('commit por venta', False), ('commit agrupado', True)):
+        path = tempfile.mkdtemp(prefix='bench_sales_')
+        try:
+            app = scratch_app(path, group_commit, args.window_ms, args.max_batch, args.synchronous)
+            if group_commit:
+                get_writer(app)
+            elapsed, latencies, errors = run(app, args.threads, args.sales)
+            report(label, app, elapsed, latencies, errors)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
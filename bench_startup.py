@@ -0,0 +1,97 @@
+# bench_startup.py
+# Tiempo de arranque de la aplicación hasta la primera petición, en procesos
+# nuevos (arranque en frío, como un worker de gunicorn sin --preload). Cada
+# ejecución mide por separado: importar app.py, create_app() y la primera y la
+# segunda petición. Usa una base SQLite temporal creada con init_db; no toca erp.db.
+#
+#   python bench_startup.py --runs 10
+#   python bench_startup.py --path /login --runs 5
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ('import', 'create_app', 'first_request', 'second_request')
+
+def scratch_config(path):
+    database = os.path.join(path, 'bench.db')
+    return {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database,
+        'SETTINGS_VERSION_FILE': database + '.settings-version',
+        'PERMISSIONS_VERSION_FILE': database + '.permissions-version',
+        'REPORT_CACHE_DIR': os.path.join(path, 'report_cache'),
+        'METRICS_DIR': database + '.metrics',
+        'MIGRATIONS': False,
+    }
+
+def child(path, url):
+    """Se ejecuta en el proceso medido: imprime los tiempos de cada fase en JSON."""
+    timings = {}
+    began = time.perf_counter()
+    from app import create_app
+    timings['import'] = time.perf_counter() - began
+
+    mark = time.perf_counter()
+    app = create_app(scratch_config(path))
+    timings['create_app'] = time.perf_counter() - mark
+
+    client = app.test_client()
+    for phase in ('first_request', 'second_request'):
+        mark = time.perf_counter()
+        response = client.get(url)
+        timings[phase] = time.perf_counter() - mark
+        if response.status_code >= 400:
+            raise SystemExit(f'{url} respondió {response.status_code}')
+    timings['modules'] = len(sys.modules)
+    timings['reportlab'] = any(name.startswith('reportlab') for name in sys.modules)
+    print(json.dumps(timings))
+
+def prepare(path):
+    from app import create_app
+    from models import init_db
+    init_db(create_app(scratch_config(path)))
+
+def run_once(path, url):
+    began = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', path, '--path', url],
+        check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    wall = time.perf_counter() - began
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['total'] = wall
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo hasta la primera petición en un proceso nuevo')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/login', help='URL de la primera petición')
+    parser.add_argument('--child', metavar='DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    path = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        prepare(path)
+        runs = [run_once(path, args.path) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    print(f'{args.runs} arranques, primera petición GET {args.path} (mediana / mínimo)')
+    for phase in PHASES + ('total',):
+        values = [run[phase] * 1000 for run in runs]
+        label = 'total (con intérprete)' if phase == 'total' else phase
+        print(f'{label:<24} {statistics.median(values):8.1f} ms {min(values):8.1f} ms')
+    print(f'{runs[-1]["modules"]} módulos cargados, reportlab '
+          f'{"cargado" if runs[-1]["reportlab"] else "sin cargar"}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# business_day.py
+# Día de negocio de la tienda. Las fechas se guardan en UTC (Sale.date,
+# CashRegister.date); el día al que pertenece cada registro depende de la zona
+# horaria de la tienda y de la hora de corte (una venta a las 01:30 con corte a
+# las 04:00 cuenta para el día anterior), ambas en SystemSettings. Se calcula al
+# insertar y se guarda indexado en business_day, así "hoy" es una búsqueda por
+# igualdad en vez de evaluar una función sobre cada fila.
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+from models import db, Sale, CashRegister
+
+DEFAULT_TIMEZONE = 'UTC'
+RECOMPUTE_BATCH = 1000
+
+def store_zone(name):
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+def valid_timezone(name):
+    return name in available_timezones()
+
+def timezone_choices():
+    return sorted(available_timezones())
+
+def day_rule(settings=None):
+    """(zona horaria, hora de corte) de los ajustes (cacheados si no se pasan)."""
+    if settings is None:
+        from settings.cache import cached_settings
+        settings = cached_settings()
+    return store_zone(getattr(settings, 'timezone', None)), getattr(settings, 'day_cutover_hour', None) or 0
+
+def business_day_for(moment, rule=None):
+    """Día de negocio de un instante UTC sin tzinfo (como Sale.date)."""
+    zone, cutover = rule or day_rule()
+    local = moment.replace(tzinfo=timezone.utc).astimezone(zone)
+    return (local - timedelta(hours=cutover)).date()
+
+def current_business_day(rule=None):
+    return business_day_for(datetime.utcnow(), rule)
+
+def business_day_bounds(day, rule=None):
+    """Rango UTC [inicio, fin) del día de negocio (para tablas sin business_day)."""
+    zone, cutover = rule or day_rule()
+    def to_utc(local_day):
+        local = datetime.combine(local_day, time(cutover), tzinfo=zone)
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_utc(day), to_utc(day + timedelta(days=1))
+
+def recompute_business_days(rule):
+    """
+    Recalcula business_day de ventas y registros de caja tras cambiar la zona
+    horaria o la hora de corte. Solo escribe las filas que cambian. No hace commit.
+    """
+    updated = 0
+    for model in (Sale, CashRegister):
+        table = model.__table__
+        changes = []
+        rows = db.session.query(model.id, model.date, model.business_day) \
+            .order_by(model.id).yield_per(RECOMPUTE_BATCH)
+        for row_id, date, current in rows:
+            day = business_day_for(date, rule)
+            if day != current:
+                changes.append({'row_id': row_id, 'day': day})
+        for start in range(0, len(changes), RECOMPUTE_BATCH):
+            db.session.execute(
+                table.update().where(table.c.id == db.bindparam('row_id'))
+                .values(business_day=db.bindparam('day')),
+                changes[start:start + RECOMPUTE_BATCH]
+            )
+        updated += len(changes)
+    return updated
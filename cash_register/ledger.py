@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import joinedload
+from models import db, CashRegister
+
+PAGE_SIZE = 50
+CURSOR_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+def parse_date_range(args):
+    """
+    Rango de días de negocio [start, end) a partir de ?start=YYYY-MM-DD&end=YYYY-MM-DD
+    (ambos opcionales, el día final incluido).
+    """
+    start = end = None
+    try:
+        if args.get('start'):
+            start = datetime.strptime(args['start'], '%Y-%m-%d').date()
+        if args.get('end'):
+            end = datetime.strptime(args['end'], '%Y-%m-%d').date() + timedelta(days=1)
+    except ValueError:
+        raise ValueError('Fechas inválidas, use el formato YYYY-MM-DD')
+    return start, end
+
+def ledger_query(start=None, end=None):
+    """Registros del rango, más recientes primero, con el usuario cargado en el mismo SELECT."""
+    query = CashRegister.query.options(joinedload(CashRegister.user))
+    if start is not None:
+        query = query.filter(CashRegister.business_day >= start)
+    if end is not None:
+        query = query.filter(CashRegister.business_day < end)
+    return query.order_by(CashRegister.date.desc(), CashRegister.id.desc())
+
+def encode_cursor(record):
+    return f'{record.date.strftime(CURSOR_FORMAT)}_{record.id}'
+
+def decode_cursor(cursor):
+    try:
+        date, record_id = cursor.rsplit('_', 1)
+        return datetime.strptime(date, CURSOR_FORMAT), int(record_id)
+    except ValueError:
+        raise ValueError('Cursor de paginación inválido')
+
+def ledger_page(start=None, end=None, after=None, page_size=PAGE_SIZE):
+    """
+    Paginación por clave (date, id): cada página es una búsqueda en el índice
+    de fecha, sin OFFSET, así cuesta lo mismo la primera que la página 500.
+    Devuelve (registros, cursor de la página siguiente o None).
+    """
+    query = ledger_query(start, end)
+    if after:
+        date, record_id = decode_cursor(after)
+        query = query.filter(or_(
+            CashRegister.date < date,
+            and_(CashRegister.date == date, CashRegister.id < record_id)
+        ))
+    records = query.limit(page_size + 1).all()
+    next_cursor = encode_cursor(records[page_size - 1]) if len(records) > page_size else None
+    return records[:page_size], next_cursor
+
+def ledger_totals(start=None, end=None):
+    """Totales del rango calculados con SUM en SQL."""
+    query = db.session.query(
+        func.count(CashRegister.id),
+        func.coalesce(func.sum(CashRegister.transfer_amount), 0.0),
+        func.coalesce(func.sum(CashRegister.cash_amount), 0.0),
+        func.coalesce(func.sum(CashRegister.total_amount), 0.0)
+    )
+    if start is not None:
+        query = query.filter(CashRegister.business_day >= start)
+    if end is not None:
+        query = query.filter(CashRegister.business_day < end)
+    count, transfer, cash, total = query.one()
+    return {'count': count, 'transfer': transfer, 'cash': cash, 'total': total}
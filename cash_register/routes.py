@@ -1,13 +1,9 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session, send_file
-from models import db, CashRegister, User, get_system_settings
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session
+from models import db, CashRegister, get_system_settings
 from auth.routes import login_required
-from datetime import datetime
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+from cash_register.ledger import parse_date_range, ledger_query, ledger_page, ledger_totals
+from business_day import current_business_day
+from reports.engine import report_response, money, YIELD_PER
 
 cash_register_bp = Blueprint('cash_register', __name__)
 
@@ -36,21 +32,37 @@ def cash_register():
         
         return redirect(url_for('cash_register.cash_register'))
     
-    # GET request - mostrar todos los registros (NO solo los de hoy)
-    all_records = CashRegister.query.order_by(CashRegister.date.desc()).all()
+    # GET request - historial paginado por (fecha, id), con filtro opcional de fechas
+    try:
+        start, end = parse_date_range(request.args)
+        records, next_cursor = ledger_page(start, end, after=request.args.get('after'))
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('cash_register.cash_register'))
     
     return render_template('modules/cash_register/cash_register.html', 
-                         today_records=all_records)  # Cambiado el nombre para claridad
+                         today_records=records,  # Cambiado el nombre para claridad
+                         totals=ledger_totals(start, end),
+                         next_cursor=next_cursor,
+                         is_first_page=not request.args.get('after'),
+                         filter_start=request.args.get('start', ''),
+                         filter_end=request.args.get('end', ''))
 
 @cash_register_bp.route('/cash_register/report')
 @login_required
 def print_cash_register_report():
-    # Obtener TODOS los registros, no solo los del día actual
-    records = CashRegister.query.order_by(CashRegister.date.desc()).all()
+    # Registros del rango elegido (todo el historial si no se indica), usuario incluido en el SELECT
+    try:
+        start, end = parse_date_range(request.args)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('cash_register.cash_register'))
+    records = ledger_query(start, end).all()
     
-    # Calcular totales
-    total_transfer = sum(record.transfer_amount for record in records)
-    total_cash = sum(record.cash_amount for record in records)
+    # Calcular totales en SQL
+    totals = ledger_totals(start, end)
+    total_transfer = totals['transfer']
+    total_cash = totals['cash']
     grand_total = total_transfer + total_cash
     
     return render_template('reports/cash_register/cash_register_report.html',
@@ -58,88 +70,56 @@ def print_cash_register_report():
                          total_transfer=total_transfer,
                          total_cash=total_cash,
                          grand_total=grand_total,
-                         date=datetime.now().strftime("%d/%m/%Y"))
+                         date=current_business_day().strftime("%d/%m/%Y"))
 
-@cash_register_bp.route('/cash_register/report/pdf')
-@login_required
-def download_cash_register_pdf():
-    # Obtener TODOS los registros, no solo los del día actual
-    records = CashRegister.query.order_by(CashRegister.date.desc()).all()
+def cash_register_report(args):
+    """Reporte de caja (ver reports/engine.py)."""
+    # Registros del rango elegido (todo el historial si no se indica), usuario incluido en el SELECT
+    start, end = parse_date_range(args)
+    records = ledger_query(start, end).yield_per(YIELD_PER)
     
-    # Calcular totales
-    total_transfer = sum(record.transfer_amount for record in records)
-    total_cash = sum(record.cash_amount for record in records)
+    # Calcular totales en SQL
+    totals = ledger_totals(start, end)
+    total_transfer = totals['transfer']
+    total_cash = totals['cash']
     grand_total = total_transfer + total_cash
-    current_date = datetime.now().strftime("%d/%m/%Y")
+    current_date = current_business_day().strftime("%d/%m/%Y")
     
     # Obtener configuración de la empresa
     settings = get_system_settings()
     company_name = settings.company_name if settings else "Tradyx"
     
-    # Crear buffer para el PDF
-    buffer = BytesIO()
-    
-    # Crear documento PDF
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Contenido del PDF
-    elements = []
-    
-    # Título con nombre de la empresa
-    elements.append(Paragraph(f"{company_name}", styles['Title']))
-    elements.append(Paragraph(f"Reporte de Caja - {current_date}", styles['Heading2']))
-    elements.append(Paragraph(" ", styles['Normal']))
-    
-    # Si no hay registros, mostrar mensaje
-    if not records:
-        elements.append(Paragraph("No hay registros de caja disponibles.", styles['Normal']))
-    else:
-        # Datos de la tabla
-        data = [["#", "Fecha", "Hora", "Transferencia", "Efectivo", "Total", "Usuario"]]
-        
-        for idx, record in enumerate(records, 1):
-            data.append([
-                str(idx),
-                record.date.strftime("%d/%m/%Y"),
-                record.date.strftime("%H:%M"),
-                f"${record.transfer_amount:.2f}",
-                f"${record.cash_amount:.2f}",
-                f"${record.total_amount:.2f}",
-                record.user.username
-            ])
-        
-        # Crear tabla
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        elements.append(table)
-        
-        # Totales
-        elements.append(Paragraph(" ", styles['Normal']))
-        elements.append(Paragraph(f"Total Transferencia: ${total_transfer:.2f}", styles['Normal']))
-        elements.append(Paragraph(f"Total Efectivo: ${total_cash:.2f}", styles['Normal']))
-        elements.append(Paragraph(f"Total General: ${grand_total:.2f}", styles['Heading3']))
-    
-    # Generar PDF
-    doc.build(elements)
-    
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"reporte_caja_completo_{current_date.replace('/', '-')}.pdf",
-        mimetype='application/pdf'
-    )
+    return {
+        'company': company_name,
+        'title': f"Reporte de Caja - {current_date}",
+        'filename': f"reporte_caja_completo_{current_date.replace('/', '-')}",
+        'numbered': True,
+        'columns': [
+            ("Fecha", lambda r: r.date.strftime("%d/%m/%Y"), None),
+            ("Hora", lambda r: r.date.strftime("%H:%M"), None),
+            ("Transferencia", lambda r: r.transfer_amount, money),
+            ("Efectivo", lambda r: r.cash_amount, money),
+            ("Total", lambda r: r.total_amount, money),
+            ("Usuario", lambda r: r.user.username, None),
+        ],
+        'rows': records,
+        'empty_message': "No hay registros de caja disponibles.",
+        'notes': [
+            (f"Total Transferencia: {money(total_transfer)}", 'Normal'),
+            (f"Total Efectivo: {money(total_cash)}", 'Normal'),
+            (f"Total General: {money(grand_total)}", 'Heading3'),
+        ],
+    }
+
+@cash_register_bp.route('/cash_register/report/pdf')
+@login_required
+def download_cash_register_pdf():
+    try:
+        report = cash_register_report(request.args)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('cash_register.cash_register'))
+    return report_response(report, 'pdf')
 
 @cash_register_bp.route('/cash_register/delete/<int:register_id>')
 @login_required
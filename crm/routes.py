@@ -1,9 +1,21 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from models import db, Customer
 from auth.routes import login_required, role_required
+from listing import ListSpec, list_page, page_json, contains
 
 crm_bp = Blueprint('crm', __name__)
 
+def _customer_search(text):
+    return contains(Customer.name, text) | contains(Customer.email, text) | contains(Customer.phone, text)
+
+CUSTOMER_LIST = ListSpec(
+    Customer,
+    columns=['id', 'name', 'email', 'phone'],
+    sorts={'name': (Customer.name,), 'id': ()},
+    default_sort='name',
+    search=_customer_search,
+)
+
 @crm_bp.route('/crm', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
@@ -23,9 +35,16 @@ def crm():
             flash(f'Error al agregar cliente: {str(e)}', 'danger')
         return redirect(url_for('crm.crm'))
     
-    customers = Customer.query.order_by(Customer.name).all()
+    customers = list_page(CUSTOMER_LIST)
     return render_template('modules/crm/crm.html', customers=customers)
 
+@crm_bp.route('/api/crm/customers')
+@login_required
+@role_required('admin')
+def api_customers():
+    """Página de clientes en JSON (?after=<cursor>&size=&sort=&search=)."""
+    return jsonify(page_json(list_page(CUSTOMER_LIST)))
+
 @crm_bp.route('/crm/update/<int:customer_id>', methods=['POST'])
 @login_required
 @role_required('admin')
@@ -0,0 +1,64 @@
+# database.py
+# Perfil del motor SQLite: pragmas aplicados en cada conexión nueva y pool adecuado
+# para varios workers de gunicorn (lectores en paralelo con los escritores de ventas).
+import os
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+SQLITE_PROFILES = {
+    # WAL permite que analytics/reportes lean mientras se registran ventas
+    'production': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,          # ms esperando al otro escritor antes de "database is locked"
+        'synchronous': 'NORMAL',       # seguro con WAL, un fsync por checkpoint y no por commit
+        'mmap_size': 268435456,        # 256 MB
+        'cache_size': -65536,          # negativo = KiB -> 64 MB por conexión
+        'temp_store': 'MEMORY',
+    },
+    # Valores por defecto de SQLite (útil para depurar o en sistemas de archivos de red)
+    'default': {},
+}
+
+def configure_sqlite(app):
+    """
+    Prepara SQLALCHEMY_ENGINE_OPTIONS según el perfil elegido.
+    Se debe llamar antes de db.init_app(app).
+    """
+    app.config.setdefault('SQLITE_PROFILE', os.environ.get('SQLITE_PROFILE', 'production'))
+    app.config.setdefault('SQLITE_PRAGMAS', {})
+    app.config.setdefault('SQLITE_POOL_SIZE', int(os.environ.get('SQLITE_POOL_SIZE', 5)))
+
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    # Sin pool_pre_ping: en un archivo local solo añade una consulta por checkout
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.pop('pool_pre_ping', None)
+    options.pop('pool_recycle', None)
+    options.setdefault('poolclass', QueuePool)
+    options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['SQLITE_POOL_SIZE'] * 2)
+    connect_args = options.setdefault('connect_args', {})
+    # Las conexiones del pool pueden pasar de un hilo a otro entre peticiones
+    connect_args.setdefault('check_same_thread', False)
+
+def sqlite_pragmas(app):
+    pragmas = dict(SQLITE_PROFILES.get(app.config.get('SQLITE_PROFILE', 'production'), {}))
+    pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+    return pragmas
+
+def apply_sqlite_pragmas(app, db):
+    """Registra el listener 'connect' que ejecuta los pragmas en cada conexión."""
+    engine = db.get_engine(app)
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(app)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
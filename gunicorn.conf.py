@@ -0,0 +1,46 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py
+# Con preload la aplicación se crea una sola vez en el proceso maestro (imports,
+# blueprints, plantillas compiladas) y los workers la heredan al hacer fork, en
+# vez de repetir el arranque cada uno.
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+def _metrics_dir():
+    from app import default_config
+    return default_config()['METRICS_DIR']
+
+def on_starting(server):
+    # Totales de workers de una ejecución anterior (metrics.py)
+    from metrics import retire_workers
+    retire_workers(_metrics_dir())
+
+def when_ready(server):
+    # En el maestro, después de cargar la aplicación y antes de crear los workers
+    if preload_app:
+        from app import warm_up
+        warm_up(server.app.wsgi())
+
+def post_fork(server, worker):
+    # Las conexiones SQLite no se pueden compartir entre procesos: si el maestro
+    # abrió alguna, el worker empieza con un pool vacío (sin cerrar las del
+    # maestro). El escritor de ventas y el pool de reportes se recrean solos al
+    # ver otro pid.
+    from models import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Último volcado de métricas del worker antes de salir
+    from metrics import flush
+    flush(_metrics_dir())
+
+def child_exit(server, worker):
+    from metrics import retire_workers
+    retire_workers(_metrics_dir(), [worker.pid])
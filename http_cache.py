@@ -0,0 +1,87 @@
+# http_cache.py
+# GET condicionales con ETag basados en los contadores de data_version.
+# Si el navegador envía If-None-Match con la versión actual se responde 304
+# sin tocar el ORM; si no, se sirve el cuerpo desde una caché acotada por
+# worker o se renderiza y se guarda con esa misma clave.
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, make_response, current_app
+from models import DataVersion
+from business_day import current_business_day
+
+CACHE_ENTRIES = 64
+CACHE_MAX_BODY = 2 * 1024 * 1024   # no se cachean cuerpos más grandes (bytes)
+
+_lock = threading.Lock()
+_bodies = OrderedDict()
+
+def _store(etag, response):
+    body = response.get_data()
+    if len(body) > current_app.config.get('HTTP_CACHE_MAX_BODY', CACHE_MAX_BODY):
+        return
+    headers = [(key, value) for key, value in response.headers
+               if key in ('Content-Type', 'Content-Disposition')]
+    with _lock:
+        _bodies[etag] = (body, response.status_code, headers)
+        _bodies.move_to_end(etag)
+        while len(_bodies) > current_app.config.get('HTTP_CACHE_ENTRIES', CACHE_ENTRIES):
+            _bodies.popitem(last=False)
+
+def _cached(etag):
+    with _lock:
+        entry = _bodies.get(etag)
+        if entry is not None:
+            _bodies.move_to_end(etag)
+        return entry
+
+def compute_etag(names):
+    """
+    ETag de la petición actual: endpoint, parámetros, usuario/rol (las plantillas
+    cambian según el rol), fecha (los títulos la muestran) y versiones de datos.
+    """
+    versions = DataVersion.many(sorted(set(names) | {'settings'}))
+    key = '|'.join([
+        request.endpoint or '',
+        repr(sorted(request.view_args.items())) if request.view_args else '',
+        request.query_string.decode('utf-8', 'replace'),
+        str(session.get('user_id')),
+        str(session.get('role')),
+        current_business_day().isoformat(),
+        repr(sorted(versions.items())),
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def versioned(*names):
+    """
+    Decorador para vistas GET que solo dependen de las tablas `names`
+    (y de los ajustes, que se incluyen siempre).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Los mensajes flash pendientes se muestran una sola vez: no se cachea
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            etag = compute_etag(names)
+            if etag in request.if_none_match:
+                response = make_response('', 304)
+            else:
+                entry = _cached(etag)
+                if entry is not None:
+                    body, status, headers = entry
+                    response = make_response(body, status, headers)
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200 or session.get('_flashes'):
+                        return response
+                    response.direct_passthrough = False
+                    _store(etag, response)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
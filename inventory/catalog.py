@@ -0,0 +1,296 @@
+import csv
+import time
+from itertools import chain
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models import db, Product, DataVersion
+from inventory.codes import normalize_code
+from reports.engine import raw_rows, header, YIELD_PER
+from sales.stock import commit_with_retry
+
+# Importación y exportación del catálogo de productos en CSV, en streaming.
+# El archivo se lee fila a fila y se escribe en bloques de IMPORT_CHUNK filas:
+# por bloque, dos consultas IN resuelven qué productos existen (por SKU o por
+# nombre), un executemany actualiza y otro inserta, y se hace commit. Así la
+# memoria no depende del tamaño del archivo y cada transacción es corta (las
+# ventas pueden escribir entre bloques). Un error en un bloque no deshace los
+# anteriores: repetir la importación es seguro porque es un upsert. Si la base
+# de datos rechaza un bloque (IntegrityError: código repetido, NOT NULL...), se
+# repite fila a fila y solo se rechazan las filas que fallan.
+#
+# Reglas del upsert:
+#   - con SKU: el producto con ese SKU; si no hay, el producto sin SKU con ese
+#     nombre (se le asigna el código); si tampoco, uno nuevo,
+#   - sin SKU: el producto con ese nombre (el más antiguo si hay varios) o uno nuevo,
+#   - las columnas ausentes o vacías conservan el valor actual,
+#   - si una fila se repite en el archivo, gana la última.
+CATALOG_COLUMNS = ('name', 'sku', 'quantity', 'price', 'unit_measure')
+HEADER_ALIASES = {
+    'nombre': 'name', 'producto': 'name',
+    'codigo': 'sku', 'código': 'sku', 'barcode': 'sku',
+    'cantidad': 'quantity', 'stock': 'quantity',
+    'precio': 'price',
+    'unidad': 'unit_measure', 'unidad_medida': 'unit_measure',
+}
+IMPORT_CHUNK = 1000
+MAX_REJECTED = 1000     # filas rechazadas que se guardan para el informe
+DEFAULT_UNIT = 'unidades'
+MAX_NAME_LENGTH = 100
+MAX_UNIT_LENGTH = 20
+
+class CatalogImportError(Exception):
+    """Error de base de datos en un bloque; `result` tiene lo ya importado antes."""
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+def _column_name(title):
+    name = title.strip().lstrip('\ufeff').lower().replace(' ', '_')
+    return HEADER_ALIASES.get(name, name)
+
+def _delimiter(line):
+    return max((',', ';', '\t'), key=line.count)
+
+def _number(text, kind):
+    text = text.strip()
+    if not text:
+        return None
+    # Coma decimal ("12,50") en archivos separados por punto y coma
+    if kind is float and ',' in text and '.' not in text:
+        text = text.replace(',', '.')
+    value = kind(text)
+    if value < 0:
+        raise ValueError('negativo')
+    return value
+
+def parse_row(fields):
+    """Valores de una fila ya asociados a sus columnas. ValueError con el motivo si no vale."""
+    name = (fields.get('name') or '').strip()
+    if not name:
+        raise ValueError('Falta el nombre')
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f'El nombre supera {MAX_NAME_LENGTH} caracteres')
+    values = {'name': name, 'sku': normalize_code(fields.get('sku'))}
+    for column, kind, label in (('quantity', int, 'Cantidad'), ('price', float, 'Precio')):
+        try:
+            values[column] = _number(fields.get(column) or '', kind)
+        except ValueError:
+            raise ValueError(f'{label} no válido: {fields.get(column)!r}')
+    unit = (fields.get('unit_measure') or '').strip() or None
+    if unit and len(unit) > MAX_UNIT_LENGTH:
+        raise ValueError(f'La unidad supera {MAX_UNIT_LENGTH} caracteres')
+    values['unit_measure'] = unit
+    return values
+
+def read_catalog(stream):
+    """
+    Genera (línea, valores, None) o (línea, None, (producto, motivo)) por cada fila
+    del CSV `stream` (texto). Acepta coma, punto y coma o tabulador y encabezados
+    en español. ValueError si falta el encabezado.
+    """
+    first = stream.readline()
+    if not first.strip():
+        raise ValueError('El archivo está vacío')
+    reader = csv.reader(chain([first], stream), delimiter=_delimiter(first))
+    columns = [_column_name(title) for title in next(reader)]
+    if 'name' not in columns:
+        raise ValueError('El archivo debe tener una columna "name" (o "nombre")')
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        fields = dict(zip(columns, row))
+        try:
+            yield reader.line_num, parse_row(fields), None
+        except ValueError as e:
+            yield reader.line_num, None, ((fields.get('name') or '').strip(), str(e))
+
+def _merge(current, values):
+    """Los valores vacíos de una fila repetida no pisan los de la anterior."""
+    if current is None:
+        return dict(values)
+    return {**current, **{key: value for key, value in values.items() if value is not None}}
+
+def import_chunk(rows):
+    """
+    Escribe un bloque [(línea, valores)] dentro de la transacción actual (sin commit).
+    Devuelve (insertados, actualizados, [(línea, producto, motivo)] rechazados).
+    """
+    skus = {values['sku'] for _, values in rows if values['sku']}
+    names = {values['name'] for _, values in rows}
+    by_sku = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(skus))) if skus else {}
+    by_name = {}
+    for name, product_id, sku in db.session.query(Product.name, Product.id, Product.sku) \
+            .filter(Product.name.in_(names)).order_by(Product.id):
+        by_name.setdefault(name, (product_id, sku))
+
+    updates = {}        # product_id -> valores
+    inserts = {}        # clave del producto nuevo -> (línea, valores)
+    sku_targets = {}    # SKU -> destino dentro del bloque
+    for number, values in rows:
+        sku, name = values['sku'], values['name']
+        if sku and sku in sku_targets:
+            target = sku_targets[sku]
+        elif sku:
+            target = by_sku.get(sku)
+            if target is None:
+                product_id, current_sku = by_name.get(name, (None, None))
+                target = product_id if product_id is not None and current_sku is None else ('new', sku)
+            sku_targets[sku] = target
+        else:
+            target = by_name.get(name, (('new', name), None))[0]
+        if isinstance(target, tuple):
+            _, current = inserts.get(target, (number, None))
+            inserts[target] = (number, _merge(current, values))
+        else:
+            updates[target] = _merge(updates.get(target), values)
+
+    rejected = []
+    new_rows = []
+    for number, values in inserts.values():
+        if values['price'] is None:
+            rejected.append((number, values['name'], 'Falta el precio de un producto nuevo'))
+            continue
+        new_rows.append({
+            'name': values['name'],
+            'sku': values['sku'],
+            'quantity': values['quantity'] or 0,
+            'price': values['price'],
+            'daily_sales': 0,
+            'unit_measure': values['unit_measure'] or DEFAULT_UNIT,
+        })
+
+    table = Product.__table__
+    if updates:
+        # Mismas claves en todas las filas para un solo executemany: None conserva el valor
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('product_id')).values(
+                name=bindparam('new_name'),
+                sku=func.coalesce(bindparam('new_sku'), table.c.sku),
+                quantity=func.coalesce(bindparam('new_quantity'), table.c.quantity),
+                price=func.coalesce(bindparam('new_price'), table.c.price),
+                unit_measure=func.coalesce(bindparam('new_unit'), table.c.unit_measure),
+            ),
+            [{'product_id': product_id, 'new_name': values['name'], 'new_sku': values['sku'],
+              'new_quantity': values['quantity'], 'new_price': values['price'],
+              'new_unit': values['unit_measure']}
+             for product_id, values in updates.items()]
+        )
+    if new_rows:
+        db.session.execute(table.insert(), new_rows)
+    if updates or new_rows:
+        DataVersion.bump('catalog')
+    return len(new_rows), len(updates), rejected
+
+def import_catalog(stream, chunk_size=IMPORT_CHUNK, on_chunk=None):
+    """
+    Importa el CSV `stream` (texto) en bloques, con un commit por bloque.
+    Devuelve {'rows', 'inserted', 'updated', 'rejected': [(línea, producto, motivo)],
+    'rejected_total'}; `rejected` guarda como mucho MAX_REJECTED filas.
+    """
+    result = {'rows': 0, 'inserted': 0, 'updated': 0, 'rejected': [], 'rejected_total': 0}
+
+    def reject(items):
+        result['rejected_total'] += len(items)
+        room = MAX_REJECTED - len(result['rejected'])
+        result['rejected'].extend(items[:max(room, 0)])
+
+    def apply(rows):
+        inserted, updated, rejected = commit_with_retry(lambda: import_chunk(rows))
+        result['inserted'] += inserted
+        result['updated'] += updated
+        reject(rejected)
+
+    def flush(chunk):
+        try:
+            try:
+                apply(chunk)
+            except IntegrityError:
+                # commit_with_retry ya deshizo el bloque: fila a fila para aislar las que fallan
+                for row in chunk:
+                    try:
+                        apply([row])
+                    except IntegrityError as e:
+                        reject([(row[0], row[1]['name'], f'Rechazada por la base de datos: {e.orig}')])
+        except SQLAlchemyError as e:
+            raise CatalogImportError(
+                f'Error de base de datos en las líneas {chunk[0][0]}-{chunk[-1][0]} '
+                f'({getattr(e, "orig", e)}); las líneas anteriores ya se importaron', result)
+        if on_chunk:
+            on_chunk(result)
+
+    chunk = []
+    for number, values, error in read_catalog(stream):
+        result['rows'] += 1
+        if error:
+            reject([(number, *error)])
+            continue
+        chunk.append((number, values))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    result['rejected'].sort(key=lambda item: item[0])
+    return result
+
+def catalog_report():
+    """Catálogo completo con las columnas de la importación (ver reports/engine.py)."""
+    columns = [getattr(Product, name) for name in CATALOG_COLUMNS]
+    return {
+        'title': 'Catálogo de productos',
+        'filename': 'catalogo_productos',
+        'columns': [(name, (lambda row, index=index: row[index]), None)
+                    for index, name in enumerate(CATALOG_COLUMNS)],
+        'rows': db.session.query(*columns).order_by(Product.id).yield_per(YIELD_PER),
+    }
+
+def write_catalog(stream, report=None):
+    """Escribe el catálogo en `stream` (texto) fila a fila. Devuelve las filas escritas."""
+    report = report or catalog_report()
+    writer = csv.writer(stream)
+    writer.writerow(header(report))
+    count = 0
+    for values in raw_rows(report):
+        writer.writerow(values)
+        count += 1
+    return count
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=IMPORT_CHUNK, show_default=True, help='Filas por transacción.')
+@with_appcontext
+def import_products_command(path, chunk_size):
+    """Importa (upsert por SKU o nombre) un catálogo de productos en CSV."""
+    started = time.perf_counter()
+
+    def progress(result):
+        click.echo(f'  {result["rows"]} filas leídas...', err=True)
+
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        try:
+            result = import_catalog(stream, chunk_size, progress)
+        except (ValueError, CatalogImportError) as e:
+            raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - started
+    click.echo(f'{result["inserted"]} productos nuevos, {result["updated"]} actualizados, '
+               f'{result["rejected_total"]} filas rechazadas '
+               f'({result["rows"]} filas en {elapsed:.2f} s, {result["rows"] / max(elapsed, 1e-9):.0f} filas/s)')
+    for number, ref, reason in result['rejected']:
+        click.echo(f'Línea {number} ({ref}): {reason}')
+    if result['rejected_total'] > len(result['rejected']):
+        click.echo(f'... y {result["rejected_total"] - len(result["rejected"])} más')
+
+@click.command('export-products')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default='-')
+@with_appcontext
+def export_products_command(path):
+    """Exporta el catálogo en CSV (a un archivo o a la salida estándar)."""
+    if path == '-':
+        count = write_catalog(click.get_text_stream('stdout'))
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            count = write_catalog(stream)
+    click.echo(f'{count} productos exportados', err=True)
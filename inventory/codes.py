@@ -0,0 +1,104 @@
+from sqlalchemy import bindparam
+from models import db, Product
+
+# Códigos de barras / SKU de productos. Cada código identifica a un solo producto
+# (índice único ux_product_sku), así el escaneo en caja es una búsqueda por índice.
+MAX_CODE_LENGTH = 64
+
+def normalize_code(code):
+    """Quita espacios; un código vacío equivale a "sin código" (None)."""
+    code = (code or '').strip()
+    if len(code) > MAX_CODE_LENGTH:
+        raise ValueError(f'El código "{code[:20]}..." supera {MAX_CODE_LENGTH} caracteres')
+    return code or None
+
+def code_owner(code, exclude_id=None):
+    """Id del producto que ya usa `code` (o None)."""
+    query = db.session.query(Product.id).filter(Product.sku == code)
+    if exclude_id is not None:
+        query = query.filter(Product.id != exclude_id)
+    return query.scalar()
+
+def code_query(code):
+    return db.session.query(Product.id, Product.name).filter(Product.sku == normalize_code(code))
+
+def product_by_code(code):
+    """(id, nombre) del producto con ese código, por el índice único; None si no existe."""
+    # Sin código no se busca: "sku IS NULL" coincidiría con cualquier producto sin código
+    if normalize_code(code) is None:
+        return None
+    return code_query(code).first()
+
+def parse_assignments(text):
+    """
+    Líneas "producto;código" (también con coma o tabulador). El producto puede
+    ser su id o su nombre exacto. Devuelve (asignaciones, líneas rechazadas).
+    """
+    assignments, rejected = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        for separator in (';', '\t', ','):
+            if separator in line:
+                product, code = line.rsplit(separator, 1)
+                assignments.append((number, product.strip(), code.strip()))
+                break
+        else:
+            rejected.append((number, line, 'Falta el separador entre producto y código'))
+    return assignments, rejected
+
+def assign_codes(assignments):
+    """
+    Asigna códigos en bloque dentro de la transacción actual (el commit lo hace
+    quien llama). `assignments` es [(línea, producto, código)]. Los productos se
+    resuelven con dos consultas IN y los códigos se escriben con un executemany.
+    Devuelve (productos actualizados, [(línea, producto, motivo)] rechazados).
+    """
+    refs = {ref for _, ref, _ in assignments}
+    ids = {int(ref) for ref in refs if ref.isdigit()}
+    names = refs - {ref for ref in refs if ref.isdigit()}
+    known_ids = {row.id for row in db.session.query(Product.id).filter(Product.id.in_(ids))} if ids else set()
+    by_name = dict(db.session.query(Product.name, Product.id).filter(Product.name.in_(names))) if names else {}
+
+    rejected = []
+    updates = {}      # product_id -> (línea, producto, código)
+    code_users = {}   # código -> product_id dentro del lote
+    for number, ref, code in assignments:
+        product_id = (int(ref) if int(ref) in known_ids else None) if ref.isdigit() else by_name.get(ref)
+        if product_id is None:
+            rejected.append((number, ref, 'Producto no encontrado'))
+            continue
+        if product_id in updates:
+            rejected.append((number, ref, 'Producto repetido en la lista'))
+            continue
+        try:
+            code = normalize_code(code)
+        except ValueError as e:
+            rejected.append((number, ref, str(e)))
+            continue
+        if code is not None and code_users.setdefault(code, product_id) != product_id:
+            rejected.append((number, ref, f'Código {code} repetido en la lista'))
+            continue
+        updates[product_id] = (number, ref, code)
+
+    # Códigos que ya usa otro producto que no se reasigna en este lote
+    if code_users:
+        taken = db.session.query(Product.sku, Product.id) \
+            .filter(Product.sku.in_(code_users), Product.id.notin_(updates)).all()
+        for code, owner_id in taken:
+            number, ref, _ = updates.pop(code_users[code])
+            rejected.append((number, ref, f'El código {code} ya pertenece al producto {owner_id}'))
+
+    if updates:
+        table = Product.__table__
+        # Primero se liberan los códigos actuales: así se pueden intercambiar entre productos
+        db.session.execute(table.update().where(table.c.id.in_(updates)).values(sku=None))
+        rows = [{'product_id': product_id, 'code': code}
+                for product_id, (_, _, code) in updates.items() if code is not None]
+        if rows:
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('product_id')).values(sku=bindparam('code')),
+                rows
+            )
+    return len(updates), sorted(rejected, key=lambda item: item[0])
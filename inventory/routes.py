@@ -1,29 +1,59 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, session
-from models import db, Product, Sale, get_system_settings
+import io
+from sqlalchemy.exc import SQLAlchemyError
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify
+from models import db, Product, Sale, SalesRollup, DataVersion, get_system_settings
 from auth.routes import login_required, role_required
-from datetime import datetime
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+from http_cache import versioned
+from business_day import current_business_day
+from reports.engine import report_response, csv_response, money, YIELD_PER
+from inventory.search import name_filter, search_products, SEARCH_LIMIT
+from sales.totals import sale_days, rebuild_day_totals, sales_by_product
+from sales.archive import delete_archived_sales
+from inventory.codes import normalize_code, code_owner, parse_assignments, assign_codes
+from listing import ListSpec, list_page, page_json
+from inventory.catalog import import_catalog, catalog_report, CatalogImportError
 
 inventory_bp = Blueprint('inventory', __name__)
 
+LOW_STOCK = 10
+
+def _stock_filter(value):
+    if value == 'bajo':
+        return (Product.quantity > 0) & (Product.quantity <= LOW_STOCK)
+    if value == 'agotado':
+        return Product.quantity == 0
+    return None
+
+# Cada orden tiene su índice (ix_product_name, ix_product_quantity, ix_product_price)
+PRODUCT_LIST = ListSpec(
+    Product,
+    columns=['id', 'name', 'sku', 'quantity', 'price', 'unit_measure'],
+    sorts={'name': (Product.name,), 'quantity': (Product.quantity,), 'price': (Product.price,)},
+    default_sort='name',
+    filters={'stock': _stock_filter},
+    # Búsqueda case-insensitive por nombre (índice FTS)
+    search=name_filter,
+)
+
 @inventory_bp.route('/inventory', methods=['GET', 'POST'])
 @login_required
+@versioned('product', 'sale')
 def inventory():
     if request.method == 'POST' and session['role'] == 'admin':
         try:
+            sku = normalize_code(request.form.get('sku'))
+            if sku and code_owner(sku):
+                raise ValueError(f'El código {sku} ya está asignado a otro producto')
             new_product = Product(
                 name=request.form['name'],
+                sku=sku,
                 quantity=int(request.form['quantity']),
                 price=float(request.form['price']),
                 daily_sales=0,
                 unit_measure=request.form['unit_measure']  
             )
             db.session.add(new_product)
+            DataVersion.bump('catalog')
             db.session.commit()
             flash('Producto agregado exitosamente', 'success')
         except Exception as e:
@@ -31,20 +61,48 @@ def inventory():
             flash(f'Error al agregar producto: {str(e)}', 'danger')
         return redirect(url_for('inventory.inventory'))
     
-    # Obtener parámetro de búsqueda
-    search_query = request.args.get('search', '').strip()
-    
-    if search_query:
-        # Filtrar productos por nombre (búsqueda case-insensitive)
-        products = Product.query.filter(
-            Product.name.ilike(f'%{search_query}%')
-        ).order_by(Product.name).all()
-    else:
-        products = Product.query.order_by(Product.name).all()
+    products = list_page(PRODUCT_LIST)
+    # Totales del listado filtrado (no solo de la página) en una agregación
+    product_count, stock_total = products.query.with_entities(
+        db.func.count(Product.id), db.func.coalesce(db.func.sum(Product.quantity), 0)
+    ).order_by(None).one()
+    # Ventas de hoy de los productos de la página en una consulta
+    sold_today = sales_by_product([p.id for p in products])
     
     return render_template('modules/inventory/inventory.html', 
                          products=products, 
-                         search_query=search_query)
+                         product_count=product_count,
+                         stock_total=stock_total,
+                         sold_today=sold_today,
+                         low_stock=LOW_STOCK,
+                         search_query=products.params['search'])
+
+@inventory_bp.route('/api/inventory')
+@login_required
+def api_inventory():
+    """Página de productos en JSON (?after=<cursor>&size=&sort=&stock=&search=)."""
+    return jsonify(page_json(list_page(PRODUCT_LIST)))
+
+@inventory_bp.route('/api/products/search')
+@login_required
+def api_search_products():
+    """Búsqueda mientras se escribe: ?q=texto&limit=N (precio y stock incluidos)."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': True, 'products': []})
+    limit = request.args.get('limit', SEARCH_LIMIT, type=int)
+    products = search_products(query, limit)
+    return jsonify({
+        'success': True,
+        'products': [{
+            'id': p.id,
+            'name': p.name,
+            'sku': p.sku,
+            'price': p.price,
+            'quantity': p.quantity,
+            'unit_measure': p.unit_measure
+        } for p in products]
+    })
 
 @inventory_bp.route('/inventory/delete/<int:product_id>')
 @login_required
@@ -53,9 +111,14 @@ def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     try:
         # Eliminar primero las ventas asociadas
+        days = sale_days(product_id=product_id)
         Sale.query.filter_by(product_id=product_id).delete()
+        delete_archived_sales(product_id=product_id)
+        SalesRollup.query.filter_by(product_id=product_id).delete()
+        rebuild_day_totals(days)
         # Luego eliminar el producto
         db.session.delete(product)
+        DataVersion.bump('catalog')
         db.session.commit()
         flash('Producto y sus ventas asociadas eliminados correctamente', 'success')
     except Exception as e:
@@ -73,6 +136,12 @@ def update_product(product_id):
         product.quantity = int(request.form['quantity'])
         product.price = float(request.form['price'])
         product.unit_measure = request.form['unit_measure']  
+        if 'sku' in request.form:
+            sku = normalize_code(request.form['sku'])
+            if sku and code_owner(sku, exclude_id=product_id):
+                raise ValueError(f'El código {sku} ya está asignado a otro producto')
+            product.sku = sku
+        DataVersion.bump('catalog')
         db.session.commit()
         flash('Producto actualizado correctamente', 'success')
     except Exception as e:
@@ -80,8 +149,80 @@ def update_product(product_id):
         flash(f'Error al actualizar producto: {str(e)}', 'danger')
     return redirect(url_for('inventory.inventory'))
 
+@inventory_bp.route('/inventory/codes', methods=['POST'])
+@login_required
+@role_required('admin')
+def assign_product_codes():
+    """Asignación masiva de códigos: una línea "producto;código" por producto."""
+    assignments, rejected = parse_assignments(request.form.get('assignments', ''))
+    try:
+        updated, invalid = assign_codes(assignments)
+        rejected = sorted(rejected + invalid, key=lambda item: item[0])
+        if updated:
+            DataVersion.bump('catalog')
+        db.session.commit()
+        flash(f'Códigos asignados a {updated} producto(s)', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al asignar códigos: {str(e)}', 'danger')
+    for number, ref, reason in rejected[:20]:
+        flash(f'Línea {number} ({ref}): {reason}', 'warning')
+    if len(rejected) > 20:
+        flash(f'... y {len(rejected) - 20} línea(s) rechazada(s) más', 'warning')
+    return redirect(url_for('inventory.inventory'))
+
+@inventory_bp.route('/inventory/import', methods=['POST'])
+@login_required
+@role_required('admin')
+def import_products():
+    """Importación del catálogo en CSV (upsert por SKU o nombre, en bloques)."""
+    upload = request.files.get('file')
+    wants_json = request.args.get('format') == 'json'
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Seleccione un archivo CSV'}), 400
+        flash('Seleccione un archivo CSV', 'danger')
+        return redirect(url_for('inventory.inventory'))
+    # El archivo se lee en streaming; cada bloque se confirma por separado
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        result = import_catalog(stream)
+    except (ValueError, UnicodeDecodeError, CatalogImportError) as e:
+        db.session.rollback()
+        if wants_json:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        flash(f'Error al importar: {str(e)}', 'danger')
+        return redirect(url_for('inventory.inventory'))
+    except SQLAlchemyError as e:
+        # Errores fuera de los bloques (p. ej. al leer los productos existentes)
+        db.session.rollback()
+        message = f'Error de base de datos: {getattr(e, "orig", e)}'
+        if wants_json:
+            return jsonify({'success': False, 'message': message}), 500
+        flash(f'Error al importar: {message}', 'danger')
+        return redirect(url_for('inventory.inventory'))
+    if wants_json:
+        return jsonify({'success': True, **result,
+                        'rejected': [{'line': number, 'product': ref, 'reason': reason}
+                                     for number, ref, reason in result['rejected']]})
+    flash(f'Importación: {result["inserted"]} producto(s) nuevo(s), '
+          f'{result["updated"]} actualizado(s)', 'success')
+    rejected = result['rejected']
+    for number, ref, reason in rejected[:20]:
+        flash(f'Línea {number} ({ref}): {reason}', 'warning')
+    if result['rejected_total'] > 20:
+        flash(f'... y {result["rejected_total"] - 20} línea(s) rechazada(s) más', 'warning')
+    return redirect(url_for('inventory.inventory'))
+
+@inventory_bp.route('/inventory/export.csv')
+@login_required
+def export_products():
+    """Catálogo completo en CSV, en streaming (se puede volver a importar)."""
+    return csv_response(catalog_report())
+
 @inventory_bp.route('/inventory/report')
 @login_required
+@versioned('product')
 def print_inventory_report():
     # Obtener todos los productos del inventario
     products = Product.query.order_by(Product.name).all()
@@ -94,95 +235,47 @@ def print_inventory_report():
                         products=products,
                         total_products=total_products,
                         total_value=total_value,
-                        date=datetime.now().strftime("%d/%m/%Y"))
+                        date=current_business_day().strftime("%d/%m/%Y"))
+
+def inventory_report(args=None):
+    """Reporte de inventario (ver reports/engine.py)."""
+    # Productos del inventario, recorridos en bloques
+    products = Product.query.order_by(Product.name).yield_per(YIELD_PER)
+    
+    # Calcular totales en SQL
+    total_products, total_value = db.session.query(
+        db.func.coalesce(db.func.sum(Product.quantity), 0),
+        db.func.coalesce(db.func.sum(Product.price * Product.quantity), 0.0)
+    ).one()
+    current_date = current_business_day().strftime("%d/%m/%Y")
+    
+    # Obtener configuración de la empresa
+    settings = get_system_settings()
+    company_name = settings.company_name if settings else "Tradyx"
+    
+    return {
+        'company': company_name,
+        'title': f"Reporte de Inventario - {current_date}",
+        'filename': f"reporte_inventario_{current_date.replace('/', '-')}",
+        'numbered': True,
+        'columns': [
+            ("Producto", lambda p: p.name, None),
+            ("Cantidad", lambda p: p.quantity, None),
+            ("Unidad", lambda p: p.unit_measure, None),
+            ("Precio Unit.", lambda p: p.price, money),
+            ("Valor Total", lambda p: p.price * p.quantity, money),
+        ],
+        'rows': products,
+        'total_row': ["", "TOTAL PRODUCTOS:", str(total_products), "", "VALOR TOTAL:", money(total_value)],
+    }
 
 @inventory_bp.route('/inventory/report/pdf')
 @login_required
+@versioned('product')
 def download_inventory_pdf():
     try:
-        # Obtener todos los productos del inventario dentro del contexto de la sesión
-        products = Product.query.order_by(Product.name).all()
-        
-        # Extraer los datos necesarios ANTES de que se cierre la sesión
-        product_data = []
-        for product in products:
-            product_data.append({
-                'name': product.name,
-                'quantity': product.quantity,
-                'price': product.price,
-                'unit_measure': product.unit_measure
-            })
-        
-        # Calcular totales con los datos extraídos
-        total_products = sum(p['quantity'] for p in product_data)
-        total_value = sum(p['price'] * p['quantity'] for p in product_data)
-        current_date = datetime.now().strftime("%d/%m/%Y")
-        
-        # Obtener configuración de la empresa
-        settings = get_system_settings()
-        company_name = settings.company_name if settings else "Tradyx"
-        
-        # Crear buffer para el PDF
-        buffer = BytesIO()
-        
-        # Crear documento PDF
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        
-        # Contenido del PDF
-        elements = []
-        
-        # Título con nombre de la empresa
-        elements.append(Paragraph(f"{company_name}", styles['Title']))
-        elements.append(Paragraph(f"Reporte de Inventario - {current_date}", styles['Heading2']))
-        elements.append(Paragraph(" ", styles['Normal']))  # Espacio
-        
-        # Datos de la tabla - AGREGADA COLUMNA UNIDAD DE MEDIDA
-        data = [["#", "Producto", "Cantidad", "Unidad", "Precio Unit.", "Valor Total"]]
-        
-        for idx, product in enumerate(product_data, 1):
-            data.append([
-                str(idx),
-                product['name'],
-                str(product['quantity']),
-                product['unit_measure'],  # Nueva columna
-                f"${product['price']:.2f}",
-                f"${product['price'] * product['quantity']:.2f}"
-            ])
-        
-        # Totales
-        data.append(["", "TOTAL PRODUCTOS:", str(total_products), "", "VALOR TOTAL:", f"${total_value:.2f}"])
-        
-        # Crear tabla
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, -1), (-2, -1), colors.lightgrey),
-            ('BACKGROUND', (-1, -1), (-1, -1), colors.grey),
-            ('TEXTCOLOR', (-1, -1), (-1, -1), colors.whitesmoke),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ]))
-        
-        elements.append(table)
-        
-        # Generar PDF
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=f"reporte_inventario_{current_date.replace('/', '-')}.pdf",
-            mimetype='application/pdf'
-        )
+        return report_response(inventory_report(request.args), 'pdf')
         
     except Exception as e:
         flash(f'Error al generar PDF: {str(e)}', 'danger')
-        return redirect(url_for('inventory.inventory'))
\ No newline at end of file
+        return redirect(url_for('inventory.inventory'))
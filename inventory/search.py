@@ -0,0 +1,69 @@
+from sqlalchemy import case, column, inspect, literal_column, select, table
+from models import db, Product
+
+# Búsqueda de productos por nombre sobre el índice product_fts (ver models.py).
+# El tokenizador trigram indexa grupos de 3 caracteres, así que los textos más
+# cortos no pueden usar el índice: en ese caso se busca por prefijo (LIKE 'ab%',
+# que usa ix_product_name_nocase) o, en los listados, con el ILIKE de siempre.
+MIN_FTS_LENGTH = 3
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+LIKE_ESCAPE = '\\'
+
+product_fts = table('product_fts', column('rowid'), column('rank'))
+
+_fts_tables = {}
+
+def fts_enabled():
+    """True si la base de datos tiene product_fts (se comprueba una vez por proceso)."""
+    key = str(db.engine.url)
+    if key not in _fts_tables:
+        _fts_tables[key] = db.engine.dialect.name == 'sqlite' and \
+            inspect(db.engine).has_table('product_fts')
+    return _fts_tables[key]
+
+def match_expression(text):
+    # Frase entre comillas: FTS5 no interpreta operadores dentro de ella
+    return '"' + text.replace('"', '""') + '"'
+
+def escape_like(text):
+    """`text` literal dentro de un patrón LIKE: % y _ no actúan como comodines."""
+    return text.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace('%', LIKE_ESCAPE + '%') \
+        .replace('_', LIKE_ESCAPE + '_')
+
+def _prefix(text):
+    # Patrón de un solo parámetro ('ab%'): así SQLite puede usar ix_product_name_nocase
+    return Product.name.like(escape_like(text) + '%', escape=LIKE_ESCAPE)
+
+def _fts_match(text):
+    return literal_column('product_fts').op('MATCH')(match_expression(text))
+
+def _use_fts(text):
+    return len(text) >= MIN_FTS_LENGTH and fts_enabled()
+
+def name_filter(text):
+    """
+    Condición para Product.query.filter(): productos cuyo nombre contiene `text`
+    (mismos resultados que ILIKE '%text%', pero por índice si es posible).
+    """
+    if _use_fts(text):
+        return Product.id.in_(select(product_fts.c.rowid).where(_fts_match(text)))
+    return Product.name.ilike(f'%{escape_like(text)}%', escape=LIKE_ESCAPE)
+
+def search_query(text, limit=SEARCH_LIMIT):
+    """
+    Mejores coincidencias para la búsqueda mientras se escribe: primero los nombres
+    que empiezan por `text`, luego por relevancia (bm25) y por nombre.
+    """
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    if not _use_fts(text):
+        return Product.query.filter(_prefix(text)) \
+            .order_by(Product.name).limit(limit)
+    return Product.query.join(product_fts, product_fts.c.rowid == Product.id) \
+        .filter(_fts_match(text)) \
+        .order_by(case((_prefix(text), 0), else_=1),
+                  product_fts.c.rank, Product.name) \
+        .limit(limit)
+
+def search_products(text, limit=SEARCH_LIMIT):
+    return search_query(text, limit).all()
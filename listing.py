@@ -0,0 +1,218 @@
+# listing.py
+# Listados paginados en el servidor (inventario, CRM, usuarios, mantenimiento).
+# Cada vista describe su listado con un ListSpec: columnas que necesita, órdenes
+# posibles, filtros y búsqueda. list_page() lee de la petición el tamaño de
+# página (?size=), el orden (?sort=nombre o ?sort=-nombre para descendente), los
+# filtros y el cursor, y trae solo esa página.
+#
+# La paginación es por clave (keyset): WHERE (orden, id) > (última fila vista)
+# ORDER BY orden, id LIMIT n+1. Con un índice sobre las columnas de orden cada
+# página cuesta lo mismo sea cual sea el tamaño de la tabla; OFFSET, en cambio,
+# recorre todas las filas anteriores. ?page=N (offset) se acepta igualmente para
+# saltar a una página concreta. La variante JSON (page_json) sirve al scroll
+# virtual: el cliente pide la siguiente página con ?after=<cursor>.
+import base64
+import json
+from datetime import date, datetime
+from flask import request, url_for
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only
+from inventory.search import escape_like, LIKE_ESCAPE
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+CURSOR_PARAMS = ('after', 'before', 'page')
+
+def encode_cursor(values):
+    data = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, length):
+    """Valores del cursor, o None si no es válido (se vuelve a la primera página)."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+def contains(column, text):
+    """ILIKE '%text%' para las búsquedas de los ListSpec: % y _ del texto no son comodines."""
+    return column.ilike(f'%{escape_like(text)}%', escape=LIKE_ESCAPE)
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+class ListSpec:
+    """
+    Descripción de un listado:
+      columns  nombres de las columnas que se cargan (la clave primaria siempre)
+      sorts    {clave: (columnas de orden)}; se desempata por id
+      filters  {parámetro: función(valor) -> condición o None si el valor no vale}
+      search   función(texto) -> condición para ?search=
+    Las columnas de orden no deben admitir NULL (la comparación por tupla los excluiría).
+    """
+
+    def __init__(self, model, columns, sorts, default_sort, filters=None, search=None,
+                 page_size=DEFAULT_PAGE_SIZE):
+        self.model = model
+        self.columns = list(columns)
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.filters = filters or {}
+        self.search = search
+        self.page_size = page_size
+
+    def base_query(self, search='', filters=None):
+        """Consulta filtrada, sin orden ni límite (sirve también para contar)."""
+        query = self.model.query.options(load_only(*[getattr(self.model, name) for name in self.columns]))
+        if search and self.search:
+            query = query.filter(self.search(search))
+        for condition in (filters or {}).values():
+            query = query.filter(condition)
+        return query
+
+    def sort_columns(self, key):
+        return list(self.sorts[key]) + [self.model.id]
+
+    def page_query(self, query, sort, after=None, before=None):
+        """Aplica el orden y la condición de cursor; `sort` puede empezar por '-'."""
+        descending = sort.startswith('-')
+        columns = self.sort_columns(sort.lstrip('-'))
+        # Hacia atrás se recorre en sentido contrario y luego se invierte la página
+        backwards = before is not None and after is None
+        reverse = descending != backwards
+        cursor = before if backwards else after
+        if cursor is not None:
+            key, values = tuple_(*columns), tuple_(*cursor)
+            query = query.filter(key < values if reverse else key > values)
+        return query.order_by(*[column.desc() if reverse else column.asc() for column in columns])
+
+class ListPage:
+    """Una página de un listado con los enlaces a la anterior y la siguiente."""
+
+    def __init__(self, spec, items, params, next_cursor=None, prev_cursor=None, query=None):
+        self.spec = spec
+        self.items = items
+        self.params = params
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.query = query
+
+    @property
+    def sort(self):
+        return self.params['sort']
+
+    @property
+    def size(self):
+        return self.params['size']
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def url(self, **changes):
+        """URL de la vista actual con los mismos parámetros salvo `changes`."""
+        args = {key: value for key, value in request.args.items() if key not in CURSOR_PARAMS}
+        for key, value in changes.items():
+            if value is None or value == '':
+                args.pop(key, None)
+            else:
+                args[key] = value
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    def next_url(self):
+        return self.url(after=self.next_cursor) if self.has_next else None
+
+    def prev_url(self):
+        return self.url(before=self.prev_cursor) if self.has_prev else None
+
+    def sort_url(self, key):
+        """Enlace para ordenar por `key`; si ya es el orden actual, lo invierte."""
+        return self.url(sort=('-' + key) if self.sort == key else key)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+def parse_params(spec, args):
+    sort = args.get('sort') or spec.default_sort
+    if sort.lstrip('-') not in spec.sorts:
+        sort = spec.default_sort
+    filters = {}
+    for name, condition in spec.filters.items():
+        value = args.get(name, '').strip()
+        clause = condition(value) if value else None
+        if clause is not None:
+            filters[name] = clause
+    return {
+        'sort': sort,
+        'size': min(_positive_int(args.get('size'), spec.page_size), MAX_PAGE_SIZE),
+        'search': args.get('search', '').strip(),
+        'filters': filters,
+        'values': {name: args.get(name, '').strip() for name in filters},
+    }
+
+def list_page(spec, args=None):
+    """Lee los parámetros de la petición (o `args`) y devuelve la ListPage pedida."""
+    args = request.args if args is None else args
+    params = parse_params(spec, args)
+    size = params['size']
+    columns = spec.sort_columns(params['sort'].lstrip('-'))
+    base = spec.base_query(params['search'], params['filters'])
+
+    def cursor_of(item):
+        return encode_cursor(getattr(item, column.key) for column in columns)
+
+    after = decode_cursor(args['after'], len(columns)) if args.get('after') else None
+    before = decode_cursor(args['before'], len(columns)) if args.get('before') and after is None else None
+    page_number = _positive_int(args.get('page'), 1)
+
+    query = spec.page_query(base, params['sort'], after, before)
+    if after is None and before is None and page_number > 1:
+        # Salto directo a una página: OFFSET recorre las anteriores
+        query = query.offset((page_number - 1) * size)
+    rows = query.limit(size + 1).all()
+    more = len(rows) > size
+    rows = rows[:size]
+
+    if before is not None:
+        rows.reverse()
+        next_cursor = cursor_of(rows[-1]) if rows else None
+        prev_cursor = cursor_of(rows[0]) if rows and more else None
+    else:
+        next_cursor = cursor_of(rows[-1]) if rows and more else None
+        started = after is not None or page_number > 1
+        prev_cursor = cursor_of(rows[0]) if rows and started else None
+    return ListPage(spec, rows, params, next_cursor, prev_cursor, base)
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def page_json(page, fields=None):
+    """Página como JSON para el scroll virtual: filas, cursores y orden."""
+    fields = fields or page.spec.columns
+    return {
+        'items': [{name: _json_value(getattr(item, name)) for name in fields} for item in page.items],
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+        'sort': page.sort,
+        'size': page.size,
+    }
@@ -1,9 +1,29 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from models import db, MaintenanceTask
 from auth.routes import login_required, role_required
+from listing import ListSpec, list_page, page_json, contains
 
 maintenance_bp = Blueprint('maintenance', __name__)
 
+PRIORITIES = ('Alta', 'Media', 'Baja')
+STATUSES = ('Pendiente', 'En progreso', 'Completado')
+
+# Órdenes y filtros cubiertos por ix_maintenance_task_priority_due_date,
+# ix_maintenance_task_status_due_date e ix_maintenance_task_due_date
+TASK_LIST = ListSpec(
+    MaintenanceTask,
+    columns=['id', 'equipment', 'description', 'priority', 'status', 'assigned_to', 'due_date'],
+    sorts={'priority': (MaintenanceTask.priority, MaintenanceTask.due_date),
+           'due_date': (MaintenanceTask.due_date,)},
+    default_sort='priority',
+    filters={
+        'status': lambda value: MaintenanceTask.status == value if value in STATUSES else None,
+        'priority': lambda value: MaintenanceTask.priority == value if value in PRIORITIES else None,
+    },
+    search=lambda text: contains(MaintenanceTask.equipment, text) |
+                        contains(MaintenanceTask.assigned_to, text),
+)
+
 @maintenance_bp.route('/maintenance', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
@@ -25,8 +45,16 @@ def maintenance():
             flash(f'Error al crear tarea: {str(e)}', 'danger')
         return redirect(url_for('maintenance.maintenance'))
     
-    tasks = MaintenanceTask.query.order_by(MaintenanceTask.priority, MaintenanceTask.due_date).all()
-    return render_template('modules/maintenance/maintenance.html', tasks=tasks)
+    tasks = list_page(TASK_LIST)
+    return render_template('modules/maintenance/maintenance.html', tasks=tasks,
+                           priorities=PRIORITIES, statuses=STATUSES)
+
+@maintenance_bp.route('/api/maintenance/tasks')
+@login_required
+@role_required('admin')
+def api_tasks():
+    """Página de tareas en JSON (?after=<cursor>&size=&sort=&status=&priority=&search=)."""
+    return jsonify(page_json(list_page(TASK_LIST)))
 
 @maintenance_bp.route('/maintenance/update/<int:task_id>', methods=['POST'])
 @login_required
@@ -0,0 +1,299 @@
+# metrics.py
+# Métricas por endpoint: histograma de latencia, número de consultas SQL y su
+# tiempo (eventos before/after_cursor_execute de SQLAlchemy) y tamaño de la
+# respuesta. Se exponen en formato de texto de Prometheus en /metrics y,
+# opcionalmente (METRICS_SERVER_TIMING), en la cabecera Server-Timing de cada
+# respuesta, que el navegador muestra en la pestaña de red.
+#
+# Cada worker acumula en memoria y un hilo del worker vuelca sus totales cada
+# METRICS_FLUSH_SECONDS (si cambiaron) a METRICS_DIR/worker-<pid>.json, con
+# escritura atómica (os.replace); las peticiones no escriben a disco. /metrics
+# suma los archivos de todos los workers, así cualquier worker responde con los
+# datos de todos. Cuando gunicorn retira un worker (gunicorn.conf.py) sus totales
+# se suman a retired.json y se borra su archivo: los contadores no bajan.
+#
+# Las consultas que hace el escritor de ventas agrupadas (sales/group_commit.py)
+# van en su propio hilo y no se atribuyen a la petición que las encoló.
+import glob
+import json
+import os
+import threading
+import time
+from flask import Response, current_app, g, has_app_context, request, session
+from sqlalchemy import event
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)   # segundos
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)                            # bytes
+FLUSH_SECONDS = 1.0
+RETIRED_FILE = 'retired.json'
+SKIPPED_ENDPOINTS = ('static', 'metrics')
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+_lock = threading.Lock()
+_state = {'pid': None, 'series': {}, 'dirty': False}
+
+class RequestMetrics:
+    __slots__ = ('started', 'sql_count', 'sql_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+def _empty_series():
+    return {
+        'count': 0,
+        'latency_sum': 0.0,
+        'latency_buckets': [0] * len(LATENCY_BUCKETS),
+        'sql_count': 0,
+        'sql_seconds': 0.0,
+        'bytes': 0,
+        'size_count': 0,
+        'size_buckets': [0] * len(SIZE_BUCKETS),
+    }
+
+def _merge(target, source):
+    for name, value in source.items():
+        if isinstance(value, list):
+            target[name] = [a + b for a, b in zip(target[name], value)]
+        else:
+            target[name] = target[name] + value
+
+def _observe(buckets, limits, value):
+    # Se guardan por intervalo; la salida de Prometheus los acumula
+    for index, limit in enumerate(limits):
+        if value <= limit:
+            buckets[index] += 1
+            return
+
+def _local_series(directory=None, interval=FLUSH_SECONDS):
+    # Tras un fork (gunicorn --preload) se empieza de cero con el pid nuevo y
+    # un hilo de volcado propio (los hilos no pasan al proceso hijo)
+    if _state['pid'] != os.getpid():
+        _state.update(pid=os.getpid(), series={}, dirty=False)
+        if directory:
+            threading.Thread(target=_flush_loop, args=(directory, interval),
+                             name='metrics-flush', daemon=True).start()
+    return _state['series']
+
+def _flush_loop(directory, interval):
+    while True:
+        time.sleep(interval)
+        if _state['dirty']:
+            flush(directory)
+
+def _worker_path(directory, pid=None):
+    return os.path.join(directory, f'worker-{pid or os.getpid()}.json')
+
+def _write_json(path, data):
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        # Un worker puede haberse retirado entre el glob y la lectura
+        return {}
+
+def record(endpoint, method, status, metrics, size):
+    """Suma una petición terminada a los totales del worker."""
+    key = f'{endpoint}|{method}|{status}'
+    elapsed = time.perf_counter() - metrics.started
+    config = current_app.config
+    with _lock:
+        series = _local_series(config['METRICS_DIR'], config.get('METRICS_FLUSH_SECONDS', FLUSH_SECONDS)).get(key)
+        if series is None:
+            series = _state['series'][key] = _empty_series()
+        series['count'] += 1
+        series['latency_sum'] += elapsed
+        _observe(series['latency_buckets'], LATENCY_BUCKETS, elapsed)
+        series['sql_count'] += metrics.sql_count
+        series['sql_seconds'] += metrics.sql_seconds
+        if size is not None:
+            series['bytes'] += size
+            series['size_count'] += 1
+            _observe(series['size_buckets'], SIZE_BUCKETS, size)
+        _state['dirty'] = True
+
+def flush(directory=None):
+    """Vuelca los totales del worker a su archivo."""
+    directory = directory or current_app.config['METRICS_DIR']
+    with _lock:
+        # Copia de las listas: los buckets se siguen sumando mientras se escribe
+        data = {'series': {key: {name: list(value) if isinstance(value, list) else value
+                                 for name, value in series.items()}
+                           for key, series in _local_series().items()}}
+        _state['dirty'] = False
+    if not data['series']:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _write_json(_worker_path(directory), data)
+
+def retire_workers(directory, pids=None):
+    """
+    Suma a retired.json los archivos de los workers `pids` (todos si es None) y
+    los borra. Lo llama el maestro de gunicorn: al arrancar (archivos de una
+    ejecución anterior) y al terminar cada worker.
+    """
+    if pids is None:
+        paths = glob.glob(os.path.join(directory, 'worker-*.json'))
+    else:
+        paths = [_worker_path(directory, pid) for pid in pids]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return
+    retired = _read_json(os.path.join(directory, RETIRED_FILE)).get('series', {})
+    for path in paths:
+        for key, series in _read_json(path).get('series', {}).items():
+            _merge(retired.setdefault(key, _empty_series()), series)
+    _write_json(os.path.join(directory, RETIRED_FILE), {'series': retired})
+    for path in paths:
+        os.remove(path)
+
+def collect(directory):
+    """Totales de todos los workers (vivos y retirados) por serie."""
+    paths = glob.glob(os.path.join(directory, 'worker-*.json')) + [os.path.join(directory, RETIRED_FILE)]
+    totals = {}
+    for path in paths:
+        for key, series in _read_json(path).get('series', {}).items():
+            _merge(totals.setdefault(key, _empty_series()), series)
+    return totals
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _histogram(lines, name, labels, buckets, limits, total, count):
+    cumulative = 0
+    for limit, value in zip(limits, buckets):
+        cumulative += value
+        lines.append(f'{name}_bucket{{{labels},le="{limit}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+
+def render_prometheus(totals):
+    """Texto de exposición de Prometheus (versión 0.0.4)."""
+    rows = []
+    for key in sorted(totals):
+        endpoint, method, status = key.split('|')
+        labels = f'endpoint="{_label(endpoint)}",method="{_label(method)}",status="{_label(status)}"'
+        rows.append((labels, totals[key]))
+
+    lines = ['# HELP erp_request_duration_seconds Tiempo de respuesta por endpoint.',
+             '# TYPE erp_request_duration_seconds histogram']
+    for labels, series in rows:
+        _histogram(lines, 'erp_request_duration_seconds', labels, series['latency_buckets'],
+                   LATENCY_BUCKETS, series['latency_sum'], series['count'])
+    lines += ['# HELP erp_request_sql_statements_total Consultas SQL ejecutadas por las peticiones.',
+              '# TYPE erp_request_sql_statements_total counter']
+    lines += [f'erp_request_sql_statements_total{{{labels}}} {series["sql_count"]}' for labels, series in rows]
+    lines += ['# HELP erp_request_sql_seconds_total Tiempo total en consultas SQL.',
+              '# TYPE erp_request_sql_seconds_total counter']
+    lines += [f'erp_request_sql_seconds_total{{{labels}}} {series["sql_seconds"]}' for labels, series in rows]
+    lines += ['# HELP erp_response_size_bytes Tamaño del cuerpo de la respuesta.',
+              '# TYPE erp_response_size_bytes histogram']
+    for labels, series in rows:
+        _histogram(lines, 'erp_response_size_bytes', labels, series['size_buckets'],
+                   SIZE_BUCKETS, series['bytes'], series['size_count'])
+    return '\n'.join(lines) + '\n'
+
+# --- Integración con Flask y SQLAlchemy ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    # Solo se atribuye a una petición en su propio hilo (g es por contexto)
+    metrics = g.get('metrics') if has_app_context() else None
+    if metrics is not None:
+        metrics.sql_count += 1
+        metrics.sql_seconds += elapsed
+
+def _handle_error(context):
+    # Una consulta que falla no llega a after_cursor_execute
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+def _start_request():
+    if request.endpoint not in SKIPPED_ENDPOINTS:
+        g.metrics = RequestMetrics()
+
+def _counted(body, on_close):
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk)
+            yield chunk
+    finally:
+        on_close(size)
+
+def _finish_request(response):
+    # Se queda en g: una respuesta en streaming sigue contando consultas al generarse
+    metrics = g.get('metrics')
+    if metrics is None:
+        return response
+    endpoint, method, status = request.endpoint or 'sin_ruta', request.method, response.status_code
+
+    if current_app.config.get('METRICS_SERVER_TIMING'):
+        elapsed = (time.perf_counter() - metrics.started) * 1000
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed:.1f}, '
+            f'sql;dur={metrics.sql_seconds * 1000:.1f};desc="{metrics.sql_count} consultas"'
+        )
+
+    size = response.content_length
+    if size is None and response.is_streamed:
+        # El cuerpo se genera después de esta función: se mide al terminar de enviarlo
+        app = current_app._get_current_object()
+
+        def on_close(sent):
+            with app.app_context():
+                record(endpoint, method, status, metrics, sent)
+
+        response.response = _counted(response.iter_encoded(), on_close)
+        return response
+    record(endpoint, method, status, metrics, size)
+    return response
+
+def _metrics_allowed():
+    # Cerrado por defecto: con METRICS_TOKEN, el token o una sesión de admin; sin
+    # él, solo desde la propia máquina (un scraper local) o una sesión de admin
+    if session.get('role') == 'admin':
+        return True
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        return request.headers.get('Authorization') == f'Bearer {token}'
+    return request.remote_addr in LOOPBACK_ADDRESSES
+
+def metrics_view():
+    if not _metrics_allowed():
+        status = 401 if current_app.config.get('METRICS_TOKEN') else 403
+        return Response('No autorizado\n', status=status, mimetype='text/plain')
+    directory = current_app.config['METRICS_DIR']
+    flush(directory)
+    return Response(render_prometheus(collect(directory)),
+                    mimetype='text/plain', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def init_metrics(app):
+    """Registra los eventos de SQLAlchemy, los hooks de petición y /metrics."""
+    app.config.setdefault('METRICS_ENABLED', True)
+    if not app.config['METRICS_ENABLED']:
+        return
+    with app.app_context():
+        engine = db.get_engine(app)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
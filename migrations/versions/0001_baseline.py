@@ -0,0 +1,23 @@
+"""baseline: esquema existente creado por init_db (db.create_all)
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las tablas ya existen en las bases de datos instaladas (init_db -> create_all).
+    # Esta revisión solo marca el punto de partida del historial de migraciones.
+    pass
+
+
+def downgrade():
+    pass
@@ -0,0 +1,40 @@
+"""indices para las columnas más consultadas
+
+Revision ID: 0002_hot_column_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_hot_column_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+# IF NOT EXISTS porque en bases nuevas db.create_all() ya crea los índices del modelo
+INDEXES = [
+    ('ix_sale_date_product_id', 'sale', 'date, product_id'),
+    ('ix_sale_product_id', 'sale', 'product_id'),
+    ('ix_sale_user_id', 'sale', 'user_id'),
+    ('ix_product_name', 'product', 'name'),
+    ('ix_product_name_nocase', 'product', 'name COLLATE NOCASE'),
+    ('ix_cash_register_date', 'cash_register', 'date'),
+    ('ix_cash_register_user_id', 'cash_register', 'user_id'),
+    ('ix_maintenance_task_due_date', 'maintenance_task', 'due_date'),
+    ('ix_maintenance_task_status_due_date', 'maintenance_task', 'status, due_date'),
+    ('ix_maintenance_task_priority_due_date', 'maintenance_task', 'priority, due_date'),
+    ('ix_daily_sales_date', 'daily_sales', 'date'),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+def downgrade():
+    for name, _, _ in reversed(INDEXES):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
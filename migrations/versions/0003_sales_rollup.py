@@ -0,0 +1,50 @@
+"""tabla sales_rollup (ventas agregadas por hora, producto y usuario)
+
+Revision ID: 0003_sales_rollup
+Revises: 0002_hot_column_indexes
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_sales_rollup'
+down_revision = '0002_hot_column_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # init_db (db.create_all) puede haber creado ya la tabla vacía
+    if not sa.inspect(bind).has_table('sales_rollup'):
+        op.create_table(
+            'sales_rollup',
+            sa.Column('bucket_hour', sa.DateTime(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.Column('sale_count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['product.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('bucket_hour', 'product_id', 'user_id')
+        )
+    op.execute('CREATE INDEX IF NOT EXISTS ix_sales_rollup_product_id ON sales_rollup (product_id)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_sales_rollup_user_id ON sales_rollup (user_id)')
+
+    # Backfill desde el historial de ventas (equivale a `flask rebuild-sales-rollup`)
+    op.execute('DELETE FROM sales_rollup')
+    op.execute("""
+        INSERT INTO sales_rollup (bucket_hour, product_id, user_id, quantity, revenue, sale_count)
+        SELECT strftime('%Y-%m-%d %H:00:00.000000', date), product_id, user_id,
+               SUM(quantity), SUM(total), COUNT(*)
+        FROM sale
+        GROUP BY strftime('%Y-%m-%d %H:00:00.000000', date), product_id, user_id
+    """)
+
+
+def downgrade():
+    op.drop_table('sales_rollup')
@@ -0,0 +1,51 @@
+"""triggers que mantienen los contadores de cambios por tabla en data_version
+
+Revision ID: 0004_table_version_triggers
+Revises: 0003_sales_rollup
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_table_version_triggers'
+down_revision = '0003_sales_rollup'
+branch_labels = None
+depends_on = None
+
+# Igual que models.VERSIONED_TABLES (copiado: las migraciones no deben cambiar con el modelo)
+VERSIONED_TABLES = {
+    'product': 'product',
+    'sale': 'sale',
+    'cash_register': 'cash_register',
+    'system_settings': 'settings',
+}
+EVENTS = ('insert', 'update', 'delete')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('data_version'):
+        op.create_table(
+            'data_version',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+    for table, name in VERSIONED_TABLES.items():
+        for event in EVENTS:
+            op.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event}_version AFTER {event.upper()} ON {table}
+                BEGIN
+                    INSERT INTO data_version (name, version) VALUES ('{name}', 1)
+                    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+                END
+            """)
+
+
+def downgrade():
+    for table in VERSIONED_TABLES:
+        for event in EVENTS:
+            op.execute(f'DROP TRIGGER IF EXISTS trg_{table}_{event}_version')
@@ -0,0 +1,58 @@
+"""índice FTS5 (trigram) de nombres de producto y triggers de sincronización
+
+Revision ID: 0005_product_fts
+Revises: 0004_table_version_triggers
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_product_fts'
+down_revision = '0004_table_version_triggers'
+branch_labels = None
+depends_on = None
+
+# Igual que models.PRODUCT_FTS_STATEMENTS (copiado: las migraciones no deben cambiar con el modelo)
+STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, content='product', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS trg_product_fts_insert AFTER INSERT ON product
+    BEGIN
+        INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_product_fts_delete AFTER DELETE ON product
+    BEGIN
+        INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_product_fts_update AFTER UPDATE OF name ON product
+    BEGIN
+        INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+
+def fts5_supported(bind):
+    if bind.dialect.name != 'sqlite' or bind.dialect.dbapi.sqlite_version_info < (3, 34, 0):
+        return False
+    return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not fts5_supported(bind):
+        # Sin FTS5 la búsqueda sigue funcionando con ILIKE (inventory/search.py)
+        return
+    for statement in STATEMENTS:
+        op.execute(statement)
+    # Indexa los productos existentes
+    op.execute("INSERT INTO product_fts (product_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    for event in ('insert', 'delete', 'update'):
+        op.execute(f'DROP TRIGGER IF EXISTS trg_product_fts_{event}')
+    op.execute('DROP TABLE IF EXISTS product_fts')
@@ -0,0 +1,28 @@
+"""código de barras / SKU único en product
+
+Revision ID: 0006_product_sku
+Revises: 0005_product_fts
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_product_sku'
+down_revision = '0005_product_fts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ADD COLUMN directo (sin batch): recrear la tabla borraría sus triggers
+    op.add_column('product', sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_index('ux_product_sku', 'product', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_product_sku', table_name='product')
+    with op.batch_alter_table('product') as batch_op:
+        batch_op.drop_column('sku')
@@ -0,0 +1,44 @@
+"""día de negocio indexado en sale y cash_register; zona horaria y hora de corte en system_settings
+
+Revision ID: 0007_business_day
+Revises: 0006_product_sku
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_business_day'
+down_revision = '0006_product_sku'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ADD COLUMN directo (sin batch): recrear las tablas borraría sus triggers
+    op.add_column('system_settings', sa.Column('timezone', sa.String(length=64), nullable=True, server_default='UTC'))
+    op.add_column('system_settings', sa.Column('day_cutover_hour', sa.Integer(), nullable=True, server_default='0'))
+    op.add_column('sale', sa.Column('business_day', sa.Date(), nullable=True))
+    op.add_column('cash_register', sa.Column('business_day', sa.Date(), nullable=True))
+
+    # Con los valores iniciales (UTC, corte a las 00:00) el día de negocio es la
+    # fecha UTC; al elegir otra zona en Configuración se recalcula todo
+    op.execute('UPDATE sale SET business_day = date(date) WHERE business_day IS NULL')
+    op.execute('UPDATE cash_register SET business_day = date(date) WHERE business_day IS NULL')
+
+    op.create_index('ix_sale_business_day', 'sale', ['business_day'])
+    op.create_index('ix_cash_register_business_day', 'cash_register', ['business_day'])
+
+
+def downgrade():
+    op.drop_index('ix_cash_register_business_day', table_name='cash_register')
+    op.drop_index('ix_sale_business_day', table_name='sale')
+    with op.batch_alter_table('cash_register') as batch_op:
+        batch_op.drop_column('business_day')
+    with op.batch_alter_table('sale') as batch_op:
+        batch_op.drop_column('business_day')
+    with op.batch_alter_table('system_settings') as batch_op:
+        batch_op.drop_column('day_cutover_hour')
+        batch_op.drop_column('timezone')
@@ -0,0 +1,41 @@
+"""tabla day_totals (totales por día de negocio a precio de venta)
+
+Revision ID: 0008_day_totals
+Revises: 0007_business_day
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_day_totals'
+down_revision = '0007_business_day'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('day_totals'):
+        op.create_table(
+            'day_totals',
+            sa.Column('business_day', sa.Date(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('sale_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('business_day')
+        )
+    # Totales de las ventas existentes, con el importe guardado en cada venta
+    op.execute("""
+        INSERT OR REPLACE INTO day_totals (business_day, revenue, units, sale_count)
+        SELECT business_day, SUM(total), SUM(quantity), COUNT(*)
+        FROM sale
+        WHERE business_day IS NOT NULL
+        GROUP BY business_day
+    """)
+
+
+def downgrade():
+    op.drop_table('day_totals')
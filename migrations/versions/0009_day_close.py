@@ -0,0 +1,44 @@
+"""cierre de día: tabla day_close y resumen por producto en daily_sales
+
+Revision ID: 0009_day_close
+Revises: 0008_day_totals
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_day_close'
+down_revision = '0008_day_totals'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('day_close'):
+        op.create_table(
+            'day_close',
+            sa.Column('business_day', sa.Date(), nullable=False),
+            sa.Column('closed_at', sa.DateTime(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('archived', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('business_day')
+        )
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('daily_sales')}
+    if 'product_id' not in columns:
+        op.add_column('daily_sales', sa.Column('product_id', sa.Integer(), nullable=True))
+    if 'quantity' not in columns:
+        op.add_column('daily_sales', sa.Column('quantity', sa.Integer(), nullable=True))
+    # Las tablas sale_archive_AAAA_MM se crean al cerrar cada mes (sales/archive.py)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_sales') as batch_op:
+        batch_op.drop_column('quantity')
+        batch_op.drop_column('product_id')
+    op.drop_table('day_close')
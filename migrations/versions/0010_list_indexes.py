@@ -0,0 +1,33 @@
+"""índices para los órdenes de los listados paginados
+
+Revision ID: 0010_list_indexes
+Revises: 0009_day_close
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_list_indexes'
+down_revision = '0009_day_close'
+branch_labels = None
+depends_on = None
+
+# IF NOT EXISTS porque en bases nuevas db.create_all() ya crea los índices del modelo
+INDEXES = [
+    ('ix_product_quantity', 'product', 'quantity'),
+    ('ix_product_price', 'product', 'price'),
+    ('ix_customer_name', 'customer', 'name'),
+    ('ix_user_role_username', 'user', 'role, username'),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({columns})')
+
+
+def downgrade():
+    for name, _, _ in reversed(INDEXES):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,38 @@
+"""claves de idempotencia de los carritos importados desde las cajas
+
+Revision ID: 0011_cart_receipt
+Revises: 0010_list_indexes
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_cart_receipt'
+down_revision = '0010_list_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('cart_receipt'):
+        op.create_table(
+            'cart_receipt',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('key', sa.String(length=64), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('received_at', sa.DateTime(), nullable=False),
+            sa.Column('sold_at', sa.DateTime(), nullable=True),
+            sa.Column('sale_count', sa.Integer(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_cart_receipt_key ON cart_receipt (key)')
+
+
+def downgrade():
+    op.drop_table('cart_receipt')
@@ -0,0 +1,82 @@
+"""ids de venta AUTOINCREMENT: no se reutilizan tras vaciar sale en el cierre del día
+
+Revision ID: 0012_sale_autoincrement
+Revises: 0011_cart_receipt
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_sale_autoincrement'
+down_revision = '0011_cart_receipt'
+branch_labels = None
+depends_on = None
+
+# Copiado de models.Sale y de las migraciones 0002, 0004 y 0007 (las migraciones
+# no deben cambiar con el modelo)
+COLUMNS = ('id', 'customer', 'total', 'date', 'business_day', 'user_id', 'product_id', 'quantity')
+CREATE_TABLE = """
+    CREATE TABLE {name} (
+        id INTEGER NOT NULL PRIMARY KEY{autoincrement},
+        customer VARCHAR(100) NOT NULL,
+        total FLOAT NOT NULL,
+        date DATETIME NOT NULL,
+        business_day DATE,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )
+"""
+INDEXES = (
+    ('ix_sale_date_product_id', 'date, product_id'),
+    ('ix_sale_business_day', 'business_day'),
+    ('ix_sale_product_id', 'product_id'),
+    ('ix_sale_user_id', 'user_id'),
+)
+EVENTS = ('insert', 'update', 'delete')
+ARCHIVE_PREFIX = 'sale_archive_'
+
+
+def _rebuild(autoincrement):
+    # SQLite no puede añadir AUTOINCREMENT con ALTER TABLE: se crea la tabla
+    # nueva, se copian las filas y se sustituye. DROP TABLE se lleva los
+    # índices y los triggers de data_version, que se vuelven a crear.
+    columns = ', '.join(COLUMNS)
+    op.execute(CREATE_TABLE.format(name='sale_rebuild', autoincrement=' AUTOINCREMENT' if autoincrement else ''))
+    op.execute(f'INSERT INTO sale_rebuild ({columns}) SELECT {columns} FROM sale')
+    op.execute('DROP TABLE sale')
+    op.execute('ALTER TABLE sale_rebuild RENAME TO sale')
+    for name, index_columns in INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON sale ({index_columns})')
+    for event in EVENTS:
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_sale_{event}_version AFTER {event.upper()} ON sale
+            BEGIN
+                INSERT INTO data_version (name, version) VALUES ('sale', 1)
+                ON CONFLICT(name) DO UPDATE SET version = version + 1;
+            END
+        """)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'AUTOINCREMENT' in (bind.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'sale'").scalar() or '').upper():
+        return
+    _rebuild(autoincrement=True)
+    # El siguiente id sigue al mayor que haya existido, también en los archivos
+    # mensuales: tras un cierre sale está vacía y SQLite volvería a empezar por 1
+    archives = [name for name in sa.inspect(bind).get_table_names() if name.startswith(ARCHIVE_PREFIX)]
+    highest = max([bind.exec_driver_sql(f'SELECT COALESCE(MAX(id), 0) FROM {name}').scalar()
+                   for name in ['sale'] + archives])
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'sale'")
+    op.execute(f"INSERT INTO sqlite_sequence (name, seq) VALUES ('sale', {int(highest)})")
+
+
+def downgrade():
+    _rebuild(autoincrement=False)
@@ -1,4 +1,8 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, DDL
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime  # Importación faltante
 
@@ -6,6 +10,9 @@ db = SQLAlchemy()
 
 class User(db.Model):
     __tablename__ = 'user'  
+    __table_args__ = (
+        db.Index('ix_user_role_username', 'role', 'username'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
@@ -19,23 +26,45 @@ class User(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'product'
+    __table_args__ = (
+        db.Index('ix_product_name', 'name'),
+        db.Index('ux_product_sku', 'sku', unique=True),
+        db.Index('ix_product_quantity', 'quantity'),
+        db.Index('ix_product_price', 'price'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    sku = db.Column(db.String(64), nullable=True)  # código de barras / SKU (opcional, único)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     daily_sales = db.Column(db.Integer, default=0)
     unit_measure = db.Column(db.String(20), nullable=False, default='unidades')
-    
-    def actual_sales_today(self):
-        return sum(sale.quantity for sale in self.product_sales if  
-                 sale.date.startswith(datetime.now().strftime("%Y-%m-%d")))
+    # Ventas de hoy por producto: sales.totals.sales_by_product (una consulta para toda la lista)
+
+# Búsqueda por nombre sin distinguir mayúsculas (LIKE 'abc%' puede usar este índice)
+db.Index('ix_product_name_nocase', Product.name.collate('NOCASE'))
+
+def business_day_default(context):
+    """Día de negocio a partir de la fecha UTC de la fila (ver business_day.py)."""
+    from business_day import business_day_for
+    return business_day_for(context.get_current_parameters().get('date') or datetime.utcnow())
 
 class Sale(db.Model):
     __tablename__ = 'sale'
+    __table_args__ = (
+        db.Index('ix_sale_date_product_id', 'date', 'product_id'),
+        db.Index('ix_sale_business_day', 'business_day'),
+        db.Index('ix_sale_product_id', 'product_id'),
+        db.Index('ix_sale_user_id', 'user_id'),
+        # Sin AUTOINCREMENT, SQLite reutiliza los ids al vaciar sale en el cierre
+        # del día y chocarían con los ya archivados (sales/close.py)
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer = db.Column(db.String(100), nullable=False)
     total = db.Column(db.Float, nullable=False)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  
+    business_day = db.Column(db.Date, default=business_day_default)  # día local de la tienda
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
@@ -50,15 +79,68 @@ class Sale(db.Model):
             cls.date.between(start_date, end_date)
         ).all()
 
+class SalesRollup(db.Model):
+    """Ventas agregadas por hora, producto y usuario (se mantiene junto a cada venta)"""
+    __tablename__ = 'sales_rollup'
+    __table_args__ = (
+        db.Index('ix_sales_rollup_product_id', 'product_id'),
+        db.Index('ix_sales_rollup_user_id', 'user_id'),
+    )
+    bucket_hour = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DayTotals(db.Model):
+    """Totales del día de negocio a precio de venta (se mantienen junto a cada venta)"""
+    __tablename__ = 'day_totals'
+    business_day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+
 class DailySales(db.Model):
     __tablename__ = 'daily_sales'
+    __table_args__ = (
+        db.Index('ix_daily_sales_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.String(20), nullable=False)  # Considera usar Date
     total = db.Column(db.Float, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Añadido
+    product_id = db.Column(db.Integer, nullable=True)  # resumen por producto (cierre de día)
+    quantity = db.Column(db.Integer, nullable=True)
+
+class DayClose(db.Model):
+    """Cierres de día realizados (uno por día de negocio, ver sales/close.py)"""
+    __tablename__ = 'day_close'
+    business_day = db.Column(db.Date, primary_key=True)
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    archived = db.Column(db.Integer, nullable=False, default=0)  # ventas movidas al archivo
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class CartReceipt(db.Model):
+    """Carritos ya aplicados por su clave de idempotencia (ver sales/ingest.py)"""
+    __tablename__ = 'cart_receipt'
+    __table_args__ = (
+        db.Index('ux_cart_receipt_key', 'key', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False)   # generada por la caja
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sold_at = db.Column(db.DateTime, nullable=True)  # hora de la venta en la caja (UTC)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
 
 class Customer(db.Model):
     __tablename__ = 'customer'
+    __table_args__ = (
+        db.Index('ix_customer_name', 'name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), nullable=False)
@@ -66,6 +148,11 @@ class Customer(db.Model):
 
 class MaintenanceTask(db.Model):
     __tablename__ = 'maintenance_task'
+    __table_args__ = (
+        db.Index('ix_maintenance_task_due_date', 'due_date'),
+        db.Index('ix_maintenance_task_status_due_date', 'status', 'due_date'),
+        db.Index('ix_maintenance_task_priority_due_date', 'priority', 'due_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     equipment = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -76,8 +163,14 @@ class MaintenanceTask(db.Model):
 
 class CashRegister(db.Model):
     __tablename__ = 'cash_register'
+    __table_args__ = (
+        db.Index('ix_cash_register_date', 'date'),
+        db.Index('ix_cash_register_user_id', 'user_id'),
+        db.Index('ix_cash_register_business_day', 'business_day'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    business_day = db.Column(db.Date, default=business_day_default)  # día local de la tienda
     transfer_amount = db.Column(db.Float, nullable=False, default=0.0)
     cash_amount = db.Column(db.Float, nullable=False, default=0.0)
     total_amount = db.Column(db.Float, nullable=False, default=0.0)
@@ -98,6 +191,8 @@ class SystemSettings(db.Model):
     date_format = db.Column(db.String(20), default='dd/mm/yyyy')
     language = db.Column(db.String(10), default='es')
     icon_filename = db.Column(db.String(200), default='icons8-circulacion-de-dinero-100.png')
+    timezone = db.Column(db.String(64), default='UTC')  # zona horaria de la tienda
+    day_cutover_hour = db.Column(db.Integer, default=0)  # hora local en que empieza el día de negocio
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     
@@ -110,19 +205,115 @@ class SystemSettings(db.Model):
             db.session.commit()
         return settings
 
+    @classmethod
+    def defaults(cls):
+        """Ajustes con los valores por defecto, sin guardarlos (no hace commit)."""
+        return cls(**{column.key: column.default.arg for column in cls.__table__.columns
+                      if column.default is not None and column.default.is_scalar})
+
+class DataVersion(db.Model):
+    """Contadores de versión por conjunto de datos (catálogo, etc.)"""
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, name):
+        row = db.session.execute(
+            db.select(cls.version).where(cls.name == name)
+        ).scalar()
+        return row or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Incrementa la versión dentro de la transacción actual."""
+        table = cls.__table__
+        result = db.session.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(name=name, version=1))
+
+    @classmethod
+    def many(cls, names):
+        """Versiones de varios contadores en una sola consulta."""
+        rows = db.session.execute(
+            db.select(cls.name, cls.version).where(cls.name.in_(names))
+        ).all()
+        versions = dict(rows)
+        return {name: versions.get(name, 0) for name in names}
+
+# Contadores de cambios por tabla, mantenidos por triggers de SQLite: cubren también
+# las escrituras hechas con UPDATE/INSERT directos (stock, ventas en bloque, etc.)
+VERSIONED_TABLES = {
+    'product': 'product',
+    'sale': 'sale',
+    'cash_register': 'cash_register',
+    'system_settings': 'settings',
+}
+
+def version_trigger_statements(table, name):
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_{event}_version AFTER {event.upper()} ON {table}
+        BEGIN
+            INSERT INTO data_version (name, version) VALUES ('{name}', 1)
+            ON CONFLICT(name) DO UPDATE SET version = version + 1;
+        END"""
+        for event in ('insert', 'update', 'delete')
+    ]
+
+for _table, _name in VERSIONED_TABLES.items():
+    for _statement in version_trigger_statements(_table, _name):
+        event.listen(db.Model.metadata.tables[_table], 'after_create',
+                     DDL(_statement).execute_if(dialect='sqlite'))
+
+# Índice de texto completo de nombres de producto (FTS5 con tokenizador trigram:
+# busca subcadenas sin distinguir mayúsculas, como ILIKE '%texto%', pero usando
+# el índice). Es una tabla "external content": guarda solo el índice y lee los
+# nombres de product; los triggers lo mantienen al día en cada escritura.
+PRODUCT_FTS_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, content='product', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS trg_product_fts_insert AFTER INSERT ON product
+    BEGIN
+        INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_product_fts_delete AFTER DELETE ON product
+    BEGIN
+        INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_product_fts_update AFTER UPDATE OF name ON product
+    BEGIN
+        INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+def fts5_supported(bind):
+    """True si el SQLite enlazado trae FTS5 con el tokenizador trigram (3.34+)."""
+    if bind.dialect.name != 'sqlite' or bind.dialect.dbapi.sqlite_version_info < (3, 34, 0):
+        return False
+    return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+for _statement in PRODUCT_FTS_STATEMENTS:
+    event.listen(Product.__table__, 'after_create',
+                 DDL(_statement).execute_if(callable_=lambda ddl, target, bind, **kw: fts5_supported(bind)))
+
 def get_system_settings():
     """
     Función auxiliar para obtener la configuración del sistema
-    desde cualquier parte de la aplicación
+    desde cualquier parte de la aplicación (cacheada por worker)
     """
-    settings = SystemSettings.query.first()
-    if not settings:
-        settings = SystemSettings()
-        db.session.add(settings)
-        db.session.commit()
-    return settings
+    from settings.cache import cached_settings
+    return cached_settings()
 
 def init_db(app):
+    """
+    Crea el esquema, el usuario admin y la fila de ajustes si faltan. Ya no se
+    ejecuta al importar la aplicación (cada worker de gunicorn repetía create_all
+    y un commit): se llama desde `flask init-db` al instalar o actualizar.
+    """
     with app.app_context():
         db.create_all()
         admin = User.query.filter_by(username='admin').first()
@@ -130,4 +321,23 @@ def init_db(app):
             admin = User(username='admin', role='admin')
             admin.set_password('admin123')
             db.session.add(admin)
-        db.session.commit()
\ No newline at end of file
+        # La fila de ajustes existe desde el principio: leerlos nunca escribe
+        if not SystemSettings.query.first():
+            db.session.add(SystemSettings())
+        db.session.commit()
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Crea o actualiza el esquema (migraciones) y el usuario admin."""
+    from flask_migrate import stamp, upgrade
+    app = current_app._get_current_object()
+    if not db.inspect(db.engine).has_table('user'):
+        # Base nueva: create_all ya crea el esquema actual (índices, FTS y
+        # triggers incluidos), solo se marca como al día
+        init_db(app)
+        stamp()
+    else:
+        upgrade()
+        init_db(app)
+    click.echo('Base de datos lista')
@@ -0,0 +1,142 @@
+# query_plans.py
+# Comando `flask check-query-plans`: ejecuta EXPLAIN QUERY PLAN sobre las consultas
+# de cada ruta y falla si alguna recorre una tabla completa sin usar índice.
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import event
+from flask.cli import with_appcontext
+from models import db, Sale, SalesRollup, DayTotals, Product, CashRegister, DailySales
+from inventory.search import fts_enabled, name_filter, search_query
+from inventory.codes import code_query
+from sales.feed import chatter_query
+from sales.totals import products_sold, sales_by_product_query, empty_days_delete
+from sales.rollup import empty_buckets_delete
+from inventory.routes import PRODUCT_LIST
+from crm.routes import CUSTOMER_LIST
+from users.routes import USER_LIST
+from maintenance.routes import TASK_LIST
+
+LISTS = [('inventory.inventory', PRODUCT_LIST), ('crm.crm', CUSTOMER_LIST),
+         ('users.users', USER_LIST), ('maintenance.maintenance', TASK_LIST)]
+
+def list_queries():
+    """Página siguiente (keyset) de cada listado con cada uno de sus órdenes."""
+    queries = []
+    for route, spec in LISTS:
+        for key in spec.sorts:
+            cursor = [1] * len(spec.sort_columns(key))
+            for sort in (key, '-' + key):
+                query = spec.page_query(spec.base_query(), sort, after=cursor).limit(spec.page_size + 1)
+                queries.append((f'{route}: ?sort={sort}', query, ()))
+    return queries
+
+def route_queries():
+    """
+    Devuelve (ruta, consulta, tablas en las que se acepta un SCAN).
+    Las agregaciones sobre toda la tabla son recorridos intencionados.
+    """
+    now = datetime.utcnow()
+    search = []
+    if fts_enabled():
+        search = [
+            ('inventory.api_search_products',
+             search_query('abc'), ()),
+            ('sales.sales: búsqueda',
+             Product.query.filter(name_filter('abc')).order_by(Product.name), ()),
+        ]
+    return search + list_queries() + [
+        ('sales.sales: productos',
+         Product.query.order_by(Product.name), ()),
+        ('inventory.api_search_products: búsqueda por prefijo',
+         search_query('ab'), ()),
+        ('sales.api_scan_sale',
+         code_query('7501234567890'), ()),
+        # Recorre sale en orden de rowid descendente y se detiene a las 50 filas
+        ('sales.sales: chatter',
+         chatter_query().order_by(Sale.id.desc()).limit(50), ('sale',)),
+        ('sales.api_chatter / sales.sales_stream',
+         chatter_query().filter(Sale.id > 1000).order_by(Sale.id).limit(50), ()),
+        ('sales.sales: total del turno',
+         DayTotals.query.filter(DayTotals.business_day == now.date()), ()),
+        ('sales.reset_daily_sales',
+         Sale.query.filter(Sale.business_day == now.date()), ()),
+        ('cash_register.cash_register: rango de días',
+         CashRegister.query.filter(CashRegister.business_day >= now.date() - timedelta(days=7))
+            .order_by(CashRegister.date.desc()), ()),
+        # Tras un cierre también lee la unión con el archivo, filtrada por índice en cada tabla
+        ('sales.print_daily_report',
+         products_sold(now.date()), ('all_sales',)),
+        # Con el día cerrado lee la unión con el archivo: all_sales ya viene filtrada por índice
+        ('inventory.inventory / sales.sales: vendido hoy por producto',
+         sales_by_product_query(now.date()), ('all_sales',)),
+        ('analytics.dashboard: ventas del periodo',
+         db.session.query(db.func.sum(SalesRollup.revenue))
+            .filter(SalesRollup.bucket_hour >= now - timedelta(days=30)), ()),
+        ('analytics.dashboard: totales',
+         db.session.query(db.func.sum(SalesRollup.revenue)), ('sales_rollup',)),
+        ('cash_register.cash_register',
+         CashRegister.query.order_by(CashRegister.date.desc()), ()),
+        ('historial de ventas diarias',
+         DailySales.query.order_by(DailySales.date.desc()), ()),
+    ] + write_queries(now)
+
+def write_queries(now):
+    """Sentencias de escritura de cada venta o baja (dentro del bloqueo de escritura)."""
+    buckets = [{'bucket_hour': now.replace(minute=0, second=0, microsecond=0),
+                'product_id': product_id, 'user_id': 1} for product_id in (1, 2)]
+    return [
+        ('sales: baja de venta -> sales_rollup', empty_buckets_delete(buckets), ()),
+        ('sales: baja de venta -> day_totals', empty_days_delete([now.date()]), ()),
+    ]
+
+def explain(query):
+    statement = getattr(query, 'statement', query)
+    plan = []
+    with db.engine.connect() as connection:
+        # Se ejecuta la sentencia tal cual (con los IN expandidos y los parámetros
+        # procesados) pero anteponiendo EXPLAIN QUERY PLAN: no lee ni escribe filas.
+        # El plan se lee del cursor antes de que SQLAlchemy procese el resultado.
+        @event.listens_for(connection, 'before_cursor_execute', retval=True)
+        def add_explain(conn, cursor, sql, parameters, context, executemany):
+            return 'EXPLAIN QUERY PLAN ' + sql, parameters
+
+        @event.listens_for(connection, 'after_cursor_execute')
+        def read_plan(conn, cursor, sql, parameters, context, executemany):
+            plan.extend(row[-1] for row in cursor.fetchall())
+
+        transaction = connection.begin()
+        try:
+            connection.execute(statement).close()
+        finally:
+            transaction.rollback()
+    return plan
+
+def full_scans(plan, allowed_tables=()):
+    """Pasos 'SCAN <tabla>' sin índice que no estén en la lista de permitidos."""
+    scans = []
+    for detail in plan:
+        words = detail.split()
+        # Las tablas virtuales (FTS5) resuelven el filtro con su propio índice
+        if not words or words[0] != 'SCAN' or 'USING' in words or 'VIRTUAL' in words:
+            continue
+        table = words[2] if len(words) > 2 and words[1] == 'TABLE' else words[1]
+        if table not in allowed_tables:
+            scans.append(detail)
+    return scans
+
+@click.command('check-query-plans')
+@click.option('--verbose', '-v', is_flag=True, help='Mostrar el plan completo de cada consulta.')
+@with_appcontext
+def check_query_plans_command(verbose):
+    """Falla si alguna consulta de las rutas hace un recorrido completo de tabla."""
+    failures = 0
+    for name, query, allowed_tables in route_queries():
+        plan = explain(query)
+        scans = full_scans(plan, allowed_tables)
+        status = 'FALLO' if scans else 'ok'
+        click.echo(f'[{status}] {name}')
+        for detail in (plan if verbose else scans):
+            click.echo(f'        {detail}')
+        failures += bool(scans)
+    if failures:
+        raise click.ClickException(f'{failures} consulta(s) sin índice')
@@ -0,0 +1,107 @@
+import csv
+import io
+import tempfile
+from flask import Response, send_file, stream_with_context
+
+# Motor común de reportes. Un reporte es un dict:
+#   company, title, filename   -> encabezados y nombre del archivo (sin extensión)
+#   columns                    -> [(encabezado, valor(fila), formato(valor) o None)]
+#   rows                       -> iterable de filas (normalmente query.yield_per(...))
+#   numbered                   -> añade una primera columna "#"
+#   total_row, notes, empty_message -> como en reports/pdf.py (ya formateados);
+#                                 total_row es la última fila en los tres formatos
+# Las filas se recorren una sola vez y en streaming: CSV y XLSX nunca tienen
+# todo el reporte en memoria. PDF lo materializa en un documento (ver pdf_document).
+FORMATS = ('pdf', 'csv', 'xlsx')
+YIELD_PER = 1000
+
+def money(value):
+    return f"${value:.2f}"
+
+def header(report):
+    titles = [title for title, _, _ in report['columns']]
+    return ["#"] + titles if report.get('numbered') else titles
+
+def raw_rows(report):
+    """Valores sin formato (números como números) para CSV/XLSX."""
+    for idx, row in enumerate(report['rows'], 1):
+        values = [value(row) for _, value, _ in report['columns']]
+        yield [idx] + values if report.get('numbered') else values
+
+def formatted_rows(report):
+    """Valores como texto, con el formato de cada columna, para PDF."""
+    formats = [fmt or str for _, _, fmt in report['columns']]
+    offset = 1 if report.get('numbered') else 0
+    for values in raw_rows(report):
+        cells = [str(values[0])] if offset else []
+        cells += [fmt(value) for fmt, value in zip(formats, values[offset:])]
+        yield cells
+
+def pdf_document(report):
+    """Documento simple (serializable) para reports/pdf.py o el pool de reports/jobs.py."""
+    return {
+        'company': report['company'],
+        'title': report['title'],
+        'header': header(report),
+        'rows': list(formatted_rows(report)),
+        'total_row': report.get('total_row'),
+        'notes': report.get('notes'),
+        'empty_message': report.get('empty_message'),
+    }
+
+def csv_response(report):
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM para que Excel abra el archivo como UTF-8
+        buffer.write('\ufeff')
+        writer.writerow(header(report))
+        for values in raw_rows(report):
+            writer.writerow(values)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if report.get('total_row'):
+            writer.writerow(report['total_row'])
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f"attachment; filename={report['filename']}.csv"}
+    )
+
+def xlsx_response(report):
+    # openpyxl solo se necesita para este formato
+    from openpyxl import Workbook
+
+    # write_only escribe las filas a disco a medida que llegan
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Reporte')
+    sheet.append([report['company']])
+    sheet.append([report['title']])
+    sheet.append([])
+    sheet.append(header(report))
+    for values in raw_rows(report):
+        sheet.append(values)
+    if report.get('total_row'):
+        sheet.append(report['total_row'])
+
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    workbook.save(output)
+    output.seek(0)
+    return send_file(
+        output,
+        as_attachment=True,
+        download_name=f"{report['filename']}.xlsx",
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+def report_response(report, fmt='pdf'):
+    if fmt == 'csv':
+        return csv_response(report)
+    if fmt == 'xlsx':
+        return xlsx_response(report)
+    from reports.pdf import pdf_response
+    return pdf_response(pdf_document(report), f"{report['filename']}.pdf")
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+
+# Cola de reportes en segundo plano. El worker web solo consulta los datos
+# (rápido) y un pool de procesos local dibuja el PDF (lento). Todo el estado
+# vive en REPORT_CACHE_DIR, así cualquier worker de gunicorn puede responder
+# el estado o la descarga de un trabajo creado por otro:
+#   <id>.json   metadatos (tipo, nombre de archivo, fecha de envío)
+#   <id>.pdf    archivo terminado (también sirve de caché)
+#   <id>.error  mensaje si falló el renderizado
+# El id es un hash del contenido y del usuario que lo pide: el mismo usuario
+# pidiendo el mismo reporte con los mismos datos recibe el archivo ya generado.
+# El usuario también se guarda en <id>.json y job_status solo devuelve el
+# trabajo a ese usuario (conocer el id no basta para descargarlo).
+JOB_TIMEOUT = 600       # segundos antes de considerar perdido un trabajo pendiente
+CACHE_TTL = 24 * 3600   # segundos que se conservan los archivos generados
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+_lock = threading.Lock()
+_executor = {'pool': None, 'pid': None}
+
+def _cache_dir():
+    path = current_app.config['REPORT_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _paths(job_id):
+    base = os.path.join(_cache_dir(), job_id)
+    return {'meta': base + '.json', 'file': base + '.pdf', 'error': base + '.error'}
+
+def _pool():
+    # Un pool por proceso; tras un fork (gunicorn) se crea uno nuevo
+    with _lock:
+        if _executor['pool'] is None or _executor['pid'] != os.getpid():
+            _executor['pool'] = ProcessPoolExecutor(
+                max_workers=current_app.config.get('REPORT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor['pid'] = os.getpid()
+        return _executor['pool']
+
+def render_job(document, paths):
+    """Se ejecuta en el proceso del pool: genera el PDF y lo publica con un rename atómico."""
+    from reports.pdf import build_pdf
+    temp_path = f"{paths['file']}.{os.getpid()}.tmp"
+    try:
+        build_pdf(document, temp_path)
+        os.replace(temp_path, paths['file'])
+    except Exception as e:
+        with open(paths['error'], 'w') as f:
+            f.write(str(e))
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def job_id_for(kind, document, user_id):
+    payload = json.dumps([kind, document, user_id], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def submit_job(kind, document, filename, user_id):
+    """Encola el reporte de `user_id` (o reutiliza uno idéntico) y devuelve su id sin esperar."""
+    prune_cache()
+    job_id = job_id_for(kind, document, user_id)
+    paths = _paths(job_id)
+    status = job_status(job_id, user_id)
+    if status and status['status'] in ('done', 'pending'):
+        return job_id
+
+    # Trabajo nuevo, fallido o perdido: se (re)encola
+    if os.path.exists(paths['error']):
+        os.remove(paths['error'])
+    with open(paths['meta'], 'w') as f:
+        json.dump({'kind': kind, 'filename': filename, 'submitted': time.time(), 'user_id': user_id}, f)
+    future = _pool().submit(render_job, document, paths)
+    future.add_done_callback(lambda done: _record_failure(done, paths))
+    return job_id
+
+def _record_failure(future, paths):
+    # Errores del propio pool (p. ej. un proceso que murió): se marca el trabajo
+    # como fallido y se descarta el pool para crear uno nuevo en el próximo envío
+    error = future.exception()
+    if error is None:
+        return
+    with open(paths['error'], 'w') as f:
+        f.write(str(error) or error.__class__.__name__)
+    with _lock:
+        _executor['pool'] = None
+
+def job_status(job_id, user_id):
+    """Estado del trabajo: pending, done o failed (None si no existe o es de otro usuario)."""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    paths = _paths(job_id)
+    try:
+        with open(paths['meta']) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get('user_id') != user_id:
+        return None
+    status = {'job_id': job_id, 'kind': meta['kind'], 'filename': meta['filename']}
+    if os.path.exists(paths['file']):
+        status['status'] = 'done'
+    elif os.path.exists(paths['error']):
+        with open(paths['error']) as f:
+            status.update(status='failed', message=f.read())
+    elif time.time() - meta['submitted'] > JOB_TIMEOUT:
+        status.update(status='failed', message='El trabajo no terminó a tiempo')
+    else:
+        status['status'] = 'pending'
+    return status
+
+def job_file(job_id):
+    return _paths(job_id)['file']
+
+def prune_cache():
+    """Elimina archivos de trabajos más antiguos que CACHE_TTL."""
+    limit = time.time() - current_app.config.get('REPORT_CACHE_TTL', CACHE_TTL)
+    directory = _cache_dir()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
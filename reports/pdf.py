@@ -0,0 +1,90 @@
+from io import BytesIO
+from flask import send_file
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib import colors
+
+# Un "documento" es un dict con datos simples (se puede enviar a otro proceso):
+#   company, title        -> encabezados
+#   header, rows          -> tabla (listas de strings)
+#   total_row             -> fila de totales opcional, con estilo propio
+#   notes                 -> [(texto, estilo)] debajo de la tabla
+#   empty_message         -> texto si no hay filas (si se omite se dibuja la tabla vacía)
+TABLE_CHUNK_ROWS = 500
+
+def table_style(has_total_row):
+    style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -2 if has_total_row else -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]
+    if has_total_row:
+        style += [
+            ('BACKGROUND', (0, -1), (-2, -1), colors.lightgrey),
+            ('BACKGROUND', (-1, -1), (-1, -1), colors.grey),
+            ('TEXTCOLOR', (-1, -1), (-1, -1), colors.whitesmoke),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ]
+    return TableStyle(style)
+
+def table_chunks(document):
+    """
+    Divide filas en tablas de TABLE_CHUNK_ROWS filas: reportlab mide cada tabla
+    entera antes de partirla, así las tablas grandes no se vuelven cuadráticas.
+    Cada bloque repite el encabezado al pasar de página.
+    """
+    rows = document['rows']
+    total_row = document.get('total_row')
+    chunks = [rows[i:i + TABLE_CHUNK_ROWS] for i in range(0, len(rows), TABLE_CHUNK_ROWS)] or [[]]
+    tables = []
+    for index, chunk in enumerate(chunks):
+        is_last = index == len(chunks) - 1
+        data = [document['header']] + chunk
+        if is_last and total_row:
+            data.append(total_row)
+        table = Table(data, repeatRows=1, splitByRow=1)
+        table.setStyle(table_style(bool(is_last and total_row)))
+        tables.append(table)
+    return tables
+
+def build_pdf(document, output):
+    """Genera el PDF del documento en `output` (ruta o archivo abierto)."""
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    styles = getSampleStyleSheet()
+    
+    # Título con nombre de la empresa
+    elements = [
+        Paragraph(document['company'], styles['Title']),
+        Paragraph(document['title'], styles['Heading2']),
+        Paragraph(" ", styles['Normal']),  # Espacio
+    ]
+    
+    if not document['rows'] and document.get('empty_message'):
+        elements.append(Paragraph(document['empty_message'], styles['Normal']))
+    else:
+        elements.extend(table_chunks(document))
+        
+        if document.get('notes'):
+            elements.append(Paragraph(" ", styles['Normal']))
+            for text, style in document['notes']:
+                elements.append(Paragraph(text, styles[style]))
+    
+    doc.build(elements)
+
+def pdf_response(document, filename):
+    """Genera el PDF en memoria y lo devuelve como descarga."""
+    buffer = BytesIO()
+    build_pdf(document, buffer)
+    buffer.seek(0)
+    return send_file(
+        buffer,
+        as_attachment=True,
+        download_name=filename,
+        mimetype='application/pdf'
+    )
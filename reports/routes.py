@@ -0,0 +1,71 @@
+from flask import Blueprint, jsonify, request, url_for, send_file, abort, session
+from auth.routes import login_required
+from reports.jobs import submit_job, job_status, job_file
+from reports.engine import pdf_document, report_response, FORMATS
+from sales.routes import sales_report
+from inventory.routes import inventory_report
+from cash_register.routes import cash_register_report
+
+reports_bp = Blueprint('reports', __name__)
+
+# Reportes disponibles: tipo -> función que arma el reporte (ver reports/engine.py)
+REPORT_BUILDERS = {
+    'sales': sales_report,
+    'inventory': inventory_report,
+    'cash_register': cash_register_report,
+}
+
+def job_payload(status):
+    payload = dict(status)
+    payload['status_url'] = url_for('reports.report_job_status', job_id=status['job_id'])
+    if status['status'] == 'done':
+        payload['download_url'] = url_for('reports.download_report_job', job_id=status['job_id'])
+    return payload
+
+@reports_bp.route('/reports/<kind>/jobs', methods=['POST'])
+@login_required
+def submit_report(kind):
+    builder = REPORT_BUILDERS.get(kind)
+    if builder is None:
+        abort(404)
+    try:
+        report = builder(request.args)
+        job_id = submit_job(kind, pdf_document(report), f"{report['filename']}.pdf", session['user_id'])
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error al generar reporte: {str(e)}'}), 400
+    return jsonify(dict(success=True, **job_payload(job_status(job_id, session['user_id'])))), 202
+
+@reports_bp.route('/reports/<kind>/export.<fmt>')
+@login_required
+def export_report(kind, fmt):
+    """Descarga directa en pdf, csv (en streaming) o xlsx."""
+    builder = REPORT_BUILDERS.get(kind)
+    if builder is None or fmt not in FORMATS:
+        abort(404)
+    try:
+        report = builder(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return report_response(report, fmt)
+
+@reports_bp.route('/reports/jobs/<job_id>')
+@login_required
+def report_job_status(job_id):
+    # Solo el usuario que pidió el reporte lo ve; para los demás no existe
+    status = job_status(job_id, session['user_id'])
+    if status is None:
+        return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+    return jsonify(dict(success=True, **job_payload(status)))
+
+@reports_bp.route('/reports/jobs/<job_id>/download')
+@login_required
+def download_report_job(job_id):
+    status = job_status(job_id, session['user_id'])
+    if status is None or status['status'] != 'done':
+        abort(404)
+    return send_file(
+        job_file(job_id),
+        as_attachment=True,
+        download_name=status['filename'],
+        mimetype='application/pdf'
+    )
@@ -0,0 +1,62 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, DateTime, Date, Index, select, union_all, inspect
+from models import db, Sale
+
+# Archivo de ventas cerradas, una tabla por mes (sale_archive_AAAA_MM) según el
+# día de negocio. SQLite no tiene particiones: tablas separadas mantienen la
+# tabla sale pequeña (solo los días abiertos) y permiten borrar o exportar un
+# mes entero de una vez. Las tablas se crean al cerrar el primer día del mes y
+# no forman parte de db.metadata (create_all no las toca).
+ARCHIVE_PREFIX = 'sale_archive_'
+SALE_COLUMNS = ('id', 'customer', 'total', 'date', 'business_day', 'user_id', 'product_id', 'quantity')
+
+archive_metadata = MetaData()
+
+def archive_table_name(day):
+    return f'{ARCHIVE_PREFIX}{day:%Y_%m}'
+
+def archive_table(name):
+    if name in archive_metadata.tables:
+        return archive_metadata.tables[name]
+    return Table(
+        name, archive_metadata,
+        Column('id', Integer, primary_key=True),  # mismo id que tenía en sale
+        Column('customer', String(100), nullable=False),
+        Column('total', Float, nullable=False),
+        Column('date', DateTime, nullable=False),
+        Column('business_day', Date),
+        Column('user_id', Integer, nullable=False),
+        Column('product_id', Integer, nullable=False),
+        Column('quantity', Integer, nullable=False),
+        Column('archived_at', DateTime, nullable=False),
+        Index(f'ix_{name}_business_day', 'business_day'),
+    )
+
+def archive_for_day(day):
+    """Tabla de archivo del mes de `day`, creándola si todavía no existe."""
+    table = archive_table(archive_table_name(day))
+    table.create(db.session.connection(), checkfirst=True)
+    return table
+
+def archive_tables():
+    """Tablas de archivo existentes, de la más antigua a la más reciente."""
+    names = inspect(db.session.connection()).get_table_names()
+    return [archive_table(name) for name in sorted(names) if name.startswith(ARCHIVE_PREFIX)]
+
+def all_sales():
+    """
+    Ventas abiertas y archivadas como una sola consulta (UNION ALL), con las
+    columnas de SALE_COLUMNS. SQLite aplica los filtros dentro de cada tabla.
+    """
+    tables = [Sale.__table__] + archive_tables()
+    if len(tables) == 1:
+        return Sale.__table__
+    return union_all(*[
+        select(*[table.c[name] for name in SALE_COLUMNS]) for table in tables
+    ]).subquery('all_sales')
+
+def delete_archived_sales(**criteria):
+    """Borra ventas archivadas por columna (p. ej. user_id=3) al eliminar un usuario o producto."""
+    for table in archive_tables():
+        db.session.execute(table.delete().where(
+            *[table.c[name] == value for name, value in criteria.items()]
+        ))
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, func, literal, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Sale, Product, DailySales, DayClose
+from sales.archive import archive_for_day, SALE_COLUMNS
+from sales.stock import commit_with_retry
+from sales.totals import day_totals
+from business_day import current_business_day
+
+# Cierre del día de negocio. En una sola transacción corta:
+#   1. copia las ventas del día a su tabla de archivo mensual (sales/archive.py)
+#      y las borra de sale,
+#   2. reescribe el resumen DailySales del día por usuario y producto,
+#   3. reinicia product.daily_sales con un solo UPDATE,
+#   4. registra el cierre en day_close.
+# El rollup de analítica y day_totals no se tocan: las ventas siguen existiendo.
+# Se puede repetir: las ventas ya archivadas salieron de sale, así que un nuevo
+# cierre solo archiva las ventas tardías del mismo día, y el resumen se recalcula
+# desde el archivo. Los ids de venta son AUTOINCREMENT y no se reutilizan, así
+# que el INSERT al archivo no puede chocar; si chocara, falla y se deshace todo
+# en vez de perder la venta. Si se interrumpe, basta con repetirlo.
+
+def close_day(day, user_id=None):
+    """Cierra el día de negocio `day`. No hace commit. Devuelve el DayClose."""
+    sale_table = Sale.__table__
+    archive = archive_for_day(day)
+    now = datetime.utcnow()
+
+    # 1. Ventas del día al archivo del mes
+    db.session.execute(
+        archive.insert().from_select(
+            list(SALE_COLUMNS) + ['archived_at'],
+            select(*[sale_table.c[name] for name in SALE_COLUMNS], literal(now))
+            .where(sale_table.c.business_day == day)
+        )
+    )
+    db.session.execute(sale_table.delete().where(sale_table.c.business_day == day))
+
+    # 2. Resumen por usuario y producto, desde el archivo (incluye cierres anteriores del día)
+    daily_table = DailySales.__table__
+    date = day.strftime('%Y-%m-%d')
+    db.session.execute(daily_table.delete().where(
+        daily_table.c.date == date, daily_table.c.product_id.isnot(None)
+    ))
+    db.session.execute(daily_table.insert().from_select(
+        ['date', 'user_id', 'product_id', 'quantity', 'total'],
+        select(literal(date), archive.c.user_id, archive.c.product_id,
+               func.sum(archive.c.quantity), func.sum(archive.c.total))
+        .where(archive.c.business_day == day)
+        .group_by(archive.c.user_id, archive.c.product_id)
+    ))
+
+    # 3. Contadores del día. Si quedan ventas de días sin cerrar (p. ej. se
+    # cierra ayer después de medianoche) se recalculan a partir de ellas
+    product_table = Product.__table__
+    if db.session.query(Sale.id).limit(1).scalar() is None:
+        db.session.execute(
+            update(product_table).where(product_table.c.daily_sales != 0).values(daily_sales=0)
+        )
+    else:
+        db.session.execute(update(product_table).values(daily_sales=func.coalesce(
+            select(func.sum(sale_table.c.quantity))
+            .where(sale_table.c.product_id == product_table.c.id)
+            .scalar_subquery(), 0
+        )))
+
+    # 4. Registro del cierre
+    archived = db.session.execute(
+        select(func.count()).select_from(archive).where(archive.c.business_day == day)
+    ).scalar()
+    close_table = DayClose.__table__
+    values = {'business_day': day, 'closed_at': now, 'user_id': user_id,
+              'archived': archived, 'revenue': day_totals(day)['revenue']}
+    stmt = sqlite_insert(close_table).values(**values)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[close_table.c.business_day],
+        set_={key: stmt.excluded[key] for key in values if key != 'business_day'}
+    ))
+    return db.session.get(DayClose, day, populate_existing=True)
+
+def open_days(until):
+    """Días con ventas sin cerrar hasta `until` incluido, del más antiguo al más reciente."""
+    return [day for day, in db.session.query(Sale.business_day)
+            .filter(Sale.business_day <= until).distinct().order_by(Sale.business_day)]
+
+@click.command('close-day')
+@click.option('--day', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Último día a cerrar (AAAA-MM-DD). Por defecto, ayer.')
+@click.option('--today', 'include_today', is_flag=True, help='Cerrar también el día de hoy.')
+@with_appcontext
+def close_day_command(day, include_today):
+    """Cierra los días de negocio pendientes (uno por transacción; se puede repetir)."""
+    today = current_business_day()
+    until = day.date() if day else (today if include_today else today - timedelta(days=1))
+    days = open_days(until)
+    for pending in days:
+        closed = commit_with_retry(lambda: close_day(pending))
+        click.echo(f'{pending}: {closed.archived} ventas archivadas, total ${closed.revenue:.2f}')
+    if not days:
+        click.echo('No hay días pendientes de cierre')
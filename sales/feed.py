@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from flask import current_app
+from models import db, Sale, Product, User, DataVersion
+from sales.stock import stock_levels
+from sales.totals import day_totals
+from business_day import current_business_day
+
+# Actividad de ventas (chatter) incremental. Los clientes recuerdan el id de
+# la última venta que vieron y solo piden las posteriores: una búsqueda por
+# clave primaria en vez del join de 50 filas de cada render completo.
+#
+# /sales/stream la empuja por Server-Sent Events en peticiones cortas (long
+# poll): cada conexión consulta data_version (una lectura por clave) cada
+# STREAM_INTERVAL segundos y, en cuanto cambia 'sale', 'product' o 'catalog',
+# envía las novedades y cierra; si no cambia nada, cierra a los STREAM_TIMEOUT
+# segundos. El navegador se reconecta solo (retry) con Last-Event-ID, que lleva
+# el cursor: última venta vista y versiones de data_version, así no se pierde
+# nada entre una conexión y la siguiente. Mientras espera, una conexión ocupa un
+# hilo del worker: como mucho CHATTER_MAX_STREAMS a la vez por proceso; las
+# demás cierran enseguida y el cliente vuelve a intentarlo (sondeo), así las
+# páginas de ventas abiertas nunca dejan al worker sin hilos para el resto.
+CHATTER_LIMIT = 50
+STREAM_INTERVAL = 1.0   # segundos entre comprobaciones
+STREAM_TIMEOUT = 5      # segundos que espera una conexión sin cambios
+MAX_STREAMS = 2         # conexiones esperando a la vez por proceso
+FEED_VERSIONS = ('sale', 'product', 'catalog')
+
+_lock = threading.Lock()
+_slots = {'semaphore': None, 'pid': None}
+
+def chatter_query():
+    return db.session.query(Sale, User, Product) \
+        .join(User, User.id == Sale.user_id) \
+        .join(Product, Product.id == Sale.product_id)
+
+def recent_activity(limit=CHATTER_LIMIT):
+    """Últimas ventas, más recientes primero (para el render inicial)."""
+    return chatter_query().order_by(Sale.id.desc()).limit(limit).all()
+
+def activity_since(since_id, limit=CHATTER_LIMIT):
+    """Ventas con id > since_id, en orden de llegada."""
+    return chatter_query().filter(Sale.id > since_id) \
+        .order_by(Sale.id).limit(limit).all()
+
+def activity_json(sale, user, product):
+    return {
+        'id': sale.id,
+        'username': user.username,
+        'date': sale.date.strftime('%d/%m/%Y %H:%M'),
+        'product_id': product.id,
+        'product_name': product.name,
+        'quantity': sale.quantity,
+        'total': sale.total,
+        'customer': sale.customer,
+    }
+
+def last_sale_id():
+    return db.session.query(db.func.max(Sale.id)).scalar() or 0
+
+def all_stock_levels():
+    product_table = Product.__table__
+    return dict(db.session.execute(
+        db.select(product_table.c.id, product_table.c.quantity)
+    ).all())
+
+def stream_cursor(since_id, versions):
+    """Id de evento SSE: 'última_venta.versión_sale.versión_product.versión_catalog'."""
+    return '.'.join(str(value) for value in [since_id] + [versions.get(name, 0) for name in FEED_VERSIONS])
+
+def parse_cursor(value):
+    """(since_id, versiones) de un Last-Event-ID; versiones None si solo trae el id de venta."""
+    parts = (value or '').split('.')
+    try:
+        numbers = [int(part) for part in parts]
+    except ValueError:
+        return None, None
+    if len(numbers) == 1 + len(FEED_VERSIONS):
+        return numbers[0], dict(zip(FEED_VERSIONS, numbers[1:]))
+    if len(numbers) == 1:
+        return numbers[0], None
+    return None, None
+
+def _stream_slots():
+    # Un semáforo por proceso; tras un fork (gunicorn) se crea uno nuevo
+    with _lock:
+        if _slots['semaphore'] is None or _slots['pid'] != os.getpid():
+            _slots['semaphore'] = threading.BoundedSemaphore(
+                current_app.config.get('CHATTER_MAX_STREAMS', MAX_STREAMS))
+            _slots['pid'] = os.getpid()
+        return _slots['semaphore']
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+def _changes(since_id, versions, current):
+    """(eventos, nuevo since_id) con lo que cambió entre `versions` y `current`."""
+    events = []
+    touched = set()
+    if current.get('sale') != versions.get('sale'):
+        rows = activity_since(since_id)
+        while rows:
+            since_id = rows[-1][0].id
+            touched.update(product.id for _, _, product in rows)
+            events.append(_event('sale', {
+                'activities': [activity_json(*row) for row in rows],
+                'stock': stock_levels(touched),
+                'totals': day_totals(current_business_day()),
+            }))
+            rows = activity_since(since_id) if len(rows) == CHATTER_LIMIT else []
+        if not touched:
+            # Bajas o reinicio del día: solo cambian los totales
+            events.append(_event('totals', day_totals(current_business_day())))
+    if current.get('catalog') != versions.get('catalog'):
+        events.append(_event('catalog', {'version': current.get('catalog', 0)}))
+    elif current.get('product') != versions.get('product') and not touched:
+        events.append(_event('stock', all_stock_levels()))
+    return events, since_id
+
+def stream_events(since_id, versions=None):
+    """
+    Generador de Server-Sent Events (una respuesta corta, ver arriba):
+      sale     -> {'activities': [...], 'stock': {id: cantidad}, 'totals': totales del día}
+      totals   -> totales del día cuando cambian sin ventas nuevas (bajas, reinicio)
+      stock    -> {id: cantidad} cuando el stock cambia sin ventas nuevas (bajas, ediciones)
+      catalog  -> los productos cambiaron (altas, nombres, precios): recargar la lista
+    Termina siempre con un bloque 'id:' (sin datos) que actualiza el cursor del cliente.
+    """
+    config = current_app.config
+    interval = config.get('CHATTER_STREAM_INTERVAL', STREAM_INTERVAL)
+    deadline = time.monotonic() + config.get('CHATTER_STREAM_TIMEOUT', STREAM_TIMEOUT)
+    if versions is None:
+        versions = DataVersion.many(FEED_VERSIONS)
+    db.session.remove()
+    yield f'retry: {int(interval * 3000)}\n\n'
+
+    slots = _stream_slots()
+    if not slots.acquire(blocking=False):
+        # Todos los hilos de espera ocupados: el cliente vuelve dentro de `retry`
+        yield f'id: {stream_cursor(since_id, versions)}\n\n'
+        return
+    events = []
+    try:
+        while not events and time.monotonic() < deadline:
+            time.sleep(interval)
+            current = DataVersion.many(FEED_VERSIONS)
+            if current != versions:
+                events, since_id = _changes(since_id, versions, current)
+                versions = current
+            # Cada comprobación en su propia transacción: en WAL una lectura abierta
+            # no vería las escrituras posteriores, y la conexión vuelve al pool
+            db.session.remove()
+        yield ''.join(events) + f'id: {stream_cursor(since_id, versions)}\n\n'
+    finally:
+        slots.release()
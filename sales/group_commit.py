@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from models import db
+from sales.stock import apply_cart, apply_cart_rows, commit_with_retry
+from sales.rollup import record_sales
+from sales.totals import add_day_totals
+from business_day import day_rule
+
+# Commit agrupado de ventas (opcional, SALES_GROUP_COMMIT). En vez de una
+# transacción por venta, cada petición deja su carrito en una cola del proceso
+# y un hilo escritor los confirma en lotes: espera como mucho
+# SALES_GROUP_COMMIT_WINDOW_MS desde el primer carrito del lote (o hasta
+# SALES_GROUP_COMMIT_MAX_BATCH carritos) y los aplica en una sola transacción.
+# Cada carrito va en su propio SAVEPOINT con las comprobaciones de stock de
+# siempre, así cada petición recibe su propio resultado (o su InsufficientStock)
+# aunque compartan commit. El rollup y day_totals se escriben una vez por lote.
+#
+# El lote empieza con BEGIN IMMEDIATE: toma el bloqueo de escritura al inicio
+# (los SAVEPOINT quedan anidados en esa transacción) y una espera por otro
+# escritor ocurre antes de aplicar nada, donde commit_with_retry puede repetir.
+# Hay un escritor por aplicación y proceso; tras un fork (gunicorn) se crea uno nuevo.
+DEFAULT_WINDOW_MS = 5
+DEFAULT_MAX_BATCH = 64
+
+_lock = threading.Lock()
+
+class _PendingCart:
+    __slots__ = ('items', 'user_id', 'customer', 'done', 'result', 'error')
+
+    def __init__(self, items, user_id, customer):
+        self.items = items
+        self.user_id = user_id
+        self.customer = customer
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+class GroupCommitWriter:
+    def __init__(self, app, window=DEFAULT_WINDOW_MS / 1000, max_batch=DEFAULT_MAX_BATCH):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.carts = 0
+        self.thread = threading.Thread(target=self._run, name='sales-group-commit', daemon=True)
+        self.thread.start()
+
+    def submit(self, items, user_id, customer):
+        """Encola el carrito y espera su lote. Devuelve lo mismo que apply_cart o lanza su error."""
+        pending = _PendingCart(items, user_id, customer)
+        self.queue.put(pending)
+        # Sin timeout: el escritor siempre termina cada carrito (aplicado o con error);
+        # abandonar la espera dejaría una venta confirmada sin respuesta
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._collect()
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    for pending in batch:
+                        if not pending.done.is_set():
+                            pending.finish(error=e)
+                finally:
+                    # Cada lote con una sesión nueva; la conexión vuelve al pool
+                    db.session.remove()
+
+    def _commit(self, batch):
+        # Los ajustes (zona horaria, hora de corte) se leen antes de BEGIN IMMEDIATE:
+        # dentro de los SAVEPOINT no debe ejecutarse nada que toque la sesión
+        rule = day_rule()
+
+        def work():
+            if db.engine.dialect.name == 'sqlite':
+                db.session.execute(text('BEGIN IMMEDIATE'))
+            outcomes, sold = [], []
+            for pending in batch:
+                try:
+                    with db.session.begin_nested():
+                        product_ids, rows = apply_cart_rows(
+                            pending.items, pending.user_id, pending.customer, aggregate=False, rule=rule)
+                except Exception as e:
+                    outcomes.append((pending, None, e))
+                    continue
+                sold.extend(rows)
+                outcomes.append((pending, product_ids, None))
+            if sold:
+                record_sales(sold)
+                add_day_totals(sold)
+            return outcomes
+
+        outcomes = commit_with_retry(work)
+        self.batches += 1
+        self.carts += len(batch)
+        for pending, result, error in outcomes:
+            pending.finish(result, error)
+
+def group_commit_enabled(app=None):
+    return bool((app or current_app).config.get('SALES_GROUP_COMMIT'))
+
+def get_writer(app=None):
+    app = app or current_app._get_current_object()
+    with _lock:
+        writer, pid = app.extensions.get('sales_group_commit', (None, None))
+        if writer is None or pid != os.getpid():
+            writer = GroupCommitWriter(
+                app,
+                window=app.config.get('SALES_GROUP_COMMIT_WINDOW_MS', DEFAULT_WINDOW_MS) / 1000,
+                max_batch=app.config.get('SALES_GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH),
+            )
+            app.extensions['sales_group_commit'] = (writer, os.getpid())
+        return writer
+
+def sell_cart(items, user_id, customer='Cliente ocasional'):
+    """
+    Registra un carrito y devuelve los ids de productos tocados (InsufficientStock
+    si falta stock). Con SALES_GROUP_COMMIT pasa por el escritor del proceso; si
+    no, es una transacción propia con commit_with_retry.
+    """
+    if group_commit_enabled():
+        return get_writer().submit(items, user_id, customer)
+    return commit_with_retry(lambda: apply_cart(items, user_id, customer))
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, CartReceipt
+from sales.stock import apply_cart_rows, InsufficientStock
+from sales.rollup import record_sales
+from sales.totals import add_day_totals
+from business_day import day_rule
+
+# Ingesta en bloque de ventas hechas sin conexión en las cajas. Cada carrito
+# trae una clave de idempotencia generada por la caja (p. ej. un UUID) que se
+# guarda en cart_receipt con índice único: reenviar el mismo lote no vuelve a
+# descontar stock ni a sumar ventas, los carritos ya aplicados se devuelven
+# como 'duplicate'.
+#
+# Todo el lote va en una transacción. Por cada carrito se inserta primero su
+# recibo (INSERT ... ON CONFLICT DO NOTHING: si no inserta, es un duplicado) y
+# luego las ventas dentro de un SAVEPOINT, con las mismas comprobaciones de
+# stock que /api/sales; si un carrito no se puede aplicar se deshace solo ese
+# carrito y su recibo, y el resto del lote sigue. El primer INSERT abre la
+# transacción y toma el bloqueo de escritura, así los SAVEPOINT quedan anidados
+# en ella y ningún otro escritor cambia el stock a mitad del lote. Los ajustes
+# del día de negocio se leen antes de ese primer INSERT. El rollup y day_totals
+# se actualizan una sola vez al final con las ventas aplicadas, y los importes de
+# los recibos con un executemany; hasta entonces, una clave repetida dentro del
+# mismo lote se responde con el resumen guardado en memoria.
+MAX_BATCH_CARTS = 500
+MAX_KEY_LENGTH = 64
+MAX_CLOCK_SKEW = timedelta(minutes=5)   # margen para relojes de caja adelantados
+
+class InvalidCart(ValueError):
+    pass
+
+def parse_sold_at(value):
+    """Hora de la venta enviada por la caja (ISO 8601) como UTC sin tzinfo."""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise InvalidCart(f'Fecha no válida: {value}')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if moment > datetime.utcnow() + MAX_CLOCK_SKEW:
+        raise InvalidCart('La fecha de la venta está en el futuro')
+    return moment
+
+def validate_cart(cart):
+    """(clave, artículos, cliente, hora de venta) de un carrito; InvalidCart si no vale."""
+    if not isinstance(cart, dict):
+        raise InvalidCart('El carrito debe ser un objeto')
+    key = str(cart.get('key') or '').strip()
+    if not key:
+        raise InvalidCart('Falta la clave de idempotencia (key)')
+    if len(key) > MAX_KEY_LENGTH:
+        raise InvalidCart(f'La clave supera {MAX_KEY_LENGTH} caracteres')
+    items = cart.get('items')
+    if not isinstance(items, list) or not items:
+        raise InvalidCart('El carrito no tiene artículos')
+    try:
+        items = [{'product_id': int(item['product_id']), 'quantity': int(item['quantity'])}
+                 for item in items]
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCart('Artículo no válido: se esperan product_id y quantity enteros')
+    if any(item['quantity'] <= 0 for item in items):
+        raise InvalidCart('Las cantidades deben ser positivas')
+    customer = str(cart.get('customer') or 'Cliente ocasional')[:100]
+    return key, items, customer, parse_sold_at(cart.get('sold_at'))
+
+def _receipt_json(receipt):
+    return {'sale_count': receipt.sale_count, 'total': receipt.total}
+
+def ingest_carts(carts, user_id):
+    """
+    Aplica los carritos dentro de la transacción actual (el commit lo hace quien
+    llama). Devuelve (resultados por carrito en el mismo orden, ids de productos
+    tocados). Cada resultado es {'key', 'status': applied|duplicate|rejected, ...}.
+    """
+    table = CartReceipt.__table__
+    results = []
+    touched = set()
+    sold = []
+    applied = {}   # clave -> resumen de los carritos aplicados en este lote
+    rule = day_rule()
+    for index, cart in enumerate(carts):
+        try:
+            key, items, customer, sold_at = validate_cart(cart)
+        except InvalidCart as e:
+            key = cart.get('key') if isinstance(cart, dict) else None
+            results.append({'index': index, 'key': key, 'status': 'rejected', 'message': str(e)})
+            continue
+        if key in applied:
+            results.append({'index': index, 'key': key, 'status': 'duplicate', **applied[key]})
+            continue
+
+        inserted = db.session.execute(
+            sqlite_insert(table).values(key=key, user_id=user_id, received_at=datetime.utcnow(),
+                                        sold_at=sold_at, sale_count=0, total=0.0)
+            .on_conflict_do_nothing(index_elements=[table.c.key])
+        )
+        if inserted.rowcount == 0:
+            receipt = db.session.execute(select(table).where(table.c.key == key)).first()
+            results.append({'index': index, 'key': key, 'status': 'duplicate', **_receipt_json(receipt)})
+            continue
+
+        try:
+            with db.session.begin_nested():
+                product_ids, rows = apply_cart_rows(items, user_id, customer, sold_at, aggregate=False, rule=rule)
+        except InsufficientStock as e:
+            db.session.execute(table.delete().where(table.c.key == key))
+            results.append({'index': index, 'key': key, 'status': 'rejected',
+                            'message': f'Stock insuficiente de {e.name}. Disponible: {e.available}',
+                            'product_id': e.product_id})
+            continue
+
+        summary = applied[key] = {'sale_count': len(rows), 'total': sum(row['total'] for row in rows)}
+        touched.update(product_ids)
+        sold.extend(rows)
+        results.append({'index': index, 'key': key, 'status': 'applied', **summary})
+    if sold:
+        record_sales(sold)
+        add_day_totals(sold)
+        db.session.execute(
+            table.update().where(table.c.key == bindparam('receipt_key'))
+            .values(sale_count=bindparam('count'), total=bindparam('amount')),
+            [{'receipt_key': key, 'count': summary['sale_count'], 'amount': summary['total']}
+             for key, summary in applied.items()]
+        )
+    return results, sorted(touched)
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import click
+from flask.cli import with_appcontext
+from models import db, SalesRollup
+from sales.archive import all_sales
+
+# Mismo formato que usa SQLAlchemy para guardar DateTime en SQLite,
+# así las horas calculadas en SQL y en Python coinciden como clave
+SQL_HOUR_FORMAT = '%Y-%m-%d %H:00:00.000000'
+# Claves por DELETE de buckets vacíos (SQLite limita la profundidad de un OR)
+DELETE_CHUNK = 200
+
+def bucket_hour(date):
+    return date.replace(minute=0, second=0, microsecond=0)
+
+def _aggregate(sales, sign):
+    buckets = {}
+    for sale in sales:
+        key = (bucket_hour(sale['date']), sale['product_id'], sale['user_id'])
+        quantity, revenue, count = buckets.get(key, (0, 0.0, 0))
+        buckets[key] = (quantity + sign * sale['quantity'],
+                        revenue + sign * sale['total'],
+                        count + sign)
+    return [
+        {'bucket_hour': hour, 'product_id': product_id, 'user_id': user_id,
+         'quantity': quantity, 'revenue': revenue, 'sale_count': count}
+        for (hour, product_id, user_id), (quantity, revenue, count) in buckets.items()
+    ]
+
+def _apply(rows):
+    if not rows:
+        return
+    table = SalesRollup.__table__
+    stmt = sqlite_insert(table)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.bucket_hour, table.c.product_id, table.c.user_id],
+        set_={
+            'quantity': table.c.quantity + stmt.excluded.quantity,
+            'revenue': table.c.revenue + stmt.excluded.revenue,
+            'sale_count': table.c.sale_count + stmt.excluded.sale_count,
+        }
+    ), rows)
+    # Solo una resta puede dejar un bucket vacío: se borran únicamente esas claves
+    # (por clave primaria), nunca con un recorrido de la tabla en cada venta
+    emptied = [row for row in rows if row['sale_count'] < 0]
+    for start in range(0, len(emptied), DELETE_CHUNK):
+        db.session.execute(empty_buckets_delete(emptied[start:start + DELETE_CHUNK]))
+
+def empty_buckets_delete(rows):
+    """DELETE de los buckets de `rows` que se quedaron sin ventas."""
+    table = SalesRollup.__table__
+    # OR de claves completas: SQLite resuelve cada una por la clave primaria
+    # (MULTI-INDEX OR); (bucket, producto, usuario) IN (VALUES ...) recorre la tabla
+    keys = [and_(table.c.bucket_hour == row['bucket_hour'],
+                 table.c.product_id == row['product_id'],
+                 table.c.user_id == row['user_id']) for row in rows]
+    return table.delete().where(or_(*keys), table.c.sale_count <= 0)
+
+def record_sales(sales):
+    """
+    Suma ventas recién insertadas al rollup, dentro de la misma transacción.
+    `sales` son dicts con date, product_id, user_id, quantity y total.
+    """
+    _apply(_aggregate(sales, 1))
+
+def remove_sales(sales):
+    """Resta ventas eliminadas del rollup, dentro de la misma transacción."""
+    _apply(_aggregate(sales, -1))
+
+def sale_values(sale):
+    return {'date': sale.date, 'business_day': sale.business_day, 'product_id': sale.product_id,
+            'user_id': sale.user_id, 'quantity': sale.quantity, 'total': sale.total}
+
+def rebuild_rollup(start=None, end=None):
+    """
+    Recalcula el rollup desde las ventas (abiertas y archivadas) para [start, end)
+    (todo el historial si no se indica rango). No hace commit.
+    """
+    sale_table = all_sales()
+    rollup_table = SalesRollup.__table__
+    hour = func.strftime(SQL_HOUR_FORMAT, sale_table.c.date)
+
+    sale_filter, rollup_filter = [], []
+    if start is not None:
+        start = bucket_hour(start)
+        sale_filter.append(sale_table.c.date >= start)
+        rollup_filter.append(rollup_table.c.bucket_hour >= start)
+    if end is not None:
+        # El último bucket se recalcula completo (zonas horarias con media hora)
+        if end != bucket_hour(end):
+            end = bucket_hour(end) + timedelta(hours=1)
+        sale_filter.append(sale_table.c.date < end)
+        rollup_filter.append(rollup_table.c.bucket_hour < end)
+
+    db.session.execute(rollup_table.delete().where(and_(True, *rollup_filter)))
+    db.session.execute(rollup_table.insert().from_select(
+        ['bucket_hour', 'product_id', 'user_id', 'quantity', 'revenue', 'sale_count'],
+        select(
+            hour,
+            sale_table.c.product_id,
+            sale_table.c.user_id,
+            func.sum(sale_table.c.quantity),
+            func.sum(sale_table.c.total),
+            func.count()
+        ).where(and_(True, *sale_filter))
+        .group_by(hour, sale_table.c.product_id, sale_table.c.user_id)
+    ))
+
+@click.command('rebuild-sales-rollup')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Recalcular solo desde esta fecha (YYYY-MM-DD).')
+@with_appcontext
+def rebuild_rollup_command(since):
+    """Recalcula la tabla sales_rollup a partir de las ventas registradas."""
+    rebuild_rollup(start=since)
+    db.session.commit()
+    rows = db.session.query(func.count()).select_from(SalesRollup).scalar()
+    click.echo(f'sales_rollup reconstruida: {rows} filas')
@@ -1,18 +1,24 @@
-from flask import Blueprint, render_template, request, flash, session, jsonify, send_file, redirect, url_for
-from models import db, Sale, Product, User, DailySales, get_system_settings
-from datetime import datetime
+from flask import Blueprint, render_template, request, flash, session, jsonify, redirect, url_for, Response, stream_with_context
+from models import db, Sale, Product, DataVersion, get_system_settings
 from auth.routes import login_required, role_required
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+from http_cache import versioned
+from sales.rollup import remove_sales, sale_values
+from sales.totals import subtract_day_totals, day_totals, products_sold, sales_by_product
+from sales.close import close_day, open_days
+from sales.stock import release_stock, stock_levels, commit_with_retry, InsufficientStock
+from sales.group_commit import sell_cart
+from reports.engine import report_response, money, YIELD_PER
+from inventory.search import name_filter
+from inventory.codes import product_by_code
+from business_day import current_business_day
+from sales.ingest import ingest_carts, MAX_BATCH_CARTS
+from sales.feed import recent_activity, activity_since, activity_json, last_sale_id, stream_events, parse_cursor
 
 sales_bp = Blueprint('sales', __name__)
 
 @sales_bp.route('/sales', methods=['GET', 'POST'])
 @login_required
+@versioned('product', 'sale')
 def sales():
     if request.method == 'POST':
         try:
@@ -24,27 +30,13 @@ def sales():
                 return redirect(url_for('sales.sales'))
 
             product = Product.query.get_or_404(product_id)
-            
-            if product.quantity < quantity:
-                flash(f'Stock insuficiente de {product.name}. Disponible: {product.quantity}', 'danger')
-                return redirect(url_for('sales.sales'))
+            user_id = session['user_id']
 
-            new_sale = Sale(
-                customer="Cliente ocasional",
-                total=product.price * quantity,
-                date=datetime.utcnow(),
-                user_id=session['user_id'],
-                product_id=product.id,
-                quantity=quantity
-            )
-            
-            product.quantity -= quantity
-            product.daily_sales += quantity
-            
-            db.session.add(new_sale)
-            db.session.commit()
+            sell_cart([{'product_id': product.id, 'quantity': quantity}], user_id)
             flash('Venta registrada exitosamente', 'success')
             
+        except InsufficientStock as e:
+            flash(str(e), 'danger')
         except Exception as e:
             db.session.rollback()
             flash(f'Error al registrar venta: {str(e)}', 'danger')
@@ -55,37 +47,64 @@ def sales():
     search_query = request.args.get('search', '').strip()
     
     if search_query:
-        # Filtrar productos por nombre (búsqueda case-insensitive)
+        # Filtrar productos por nombre (búsqueda case-insensitive, índice FTS)
         products = Product.query.filter(
-            Product.name.ilike(f'%{search_query}%')
+            name_filter(search_query)
         ).order_by(Product.name).all()
     else:
         products = Product.query.order_by(Product.name).all()
     
-    # Obtener actividades para el chatter
-    chatter_activities = db.session.query(
-        Sale, User, Product
-    ).join(
-        User, User.id == Sale.user_id
-    ).join(
-        Product, Product.id == Sale.product_id
-    ).order_by(
-        Sale.date.desc()
-    ).limit(50).all()
+    # Obtener actividades para el chatter (luego llegan por /sales/stream)
+    chatter_activities = recent_activity()
     
-    # Calcular total acumulado del turno
-    today_total = db.session.query(db.func.sum(Sale.total)).filter(
-        db.func.date(Sale.date) == datetime.utcnow().date()
-    ).scalar() or 0
+    # Totales del día de negocio: una lectura por clave primaria
+    today = current_business_day()
+    totals = day_totals(today)
+    # Vendido hoy por producto: una consulta agrupada para toda la lista
+    sold_today = sales_by_product([p.id for p in products] if search_query else None, start=today)
     
     return render_template('modules/sales/sales.html', 
                          products=products,
+                         sold_today=sold_today,
                          chatter_activities=chatter_activities,
-                         current_date=datetime.utcnow().date(),
-                         today_total=today_total,
+                         last_sale_id=chatter_activities[0][0].id if chatter_activities else last_sale_id(),
+                         current_date=today,
+                         today_total=totals['revenue'],
+                         today_totals=totals,
                          search_query=search_query,
                          show_cash_register=True)  
 
+@sales_bp.route('/api/sales/chatter')
+@login_required
+def api_chatter():
+    """Actividad posterior a ?since_id=N (sin since_id: las últimas ventas)."""
+    since_id = request.args.get('since_id', type=int)
+    if since_id is None:
+        rows = list(reversed(recent_activity()))
+    else:
+        rows = activity_since(since_id)
+    return jsonify({
+        'success': True,
+        'activities': [activity_json(*row) for row in rows],
+        'last_id': rows[-1][0].id if rows else since_id or 0
+    })
+
+@sales_bp.route('/sales/stream')
+@login_required
+def sales_stream():
+    """Server-Sent Events con ventas nuevas y cambios de stock (ver sales/feed.py)."""
+    # Al reconectar, el navegador envía el cursor del último bloque en Last-Event-ID
+    since_id, versions = parse_cursor(request.headers.get('Last-Event-ID'))
+    if since_id is None:
+        since_id = request.args.get('since_id', type=int)
+    if since_id is None:
+        since_id = last_sale_id()
+    return Response(
+        stream_with_context(stream_events(since_id, versions)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @sales_bp.route('/api/sales', methods=['POST'])
 @login_required
 def api_create_sale():
@@ -97,42 +116,97 @@ def api_create_sale():
         if not items:
             return jsonify({'success': False, 'message': 'No items selected'})
         
-        # Process each item in the sale
-        for item in items:
-            product = Product.query.get(item['product_id'])
-            quantity = int(item['quantity'])
-            
-            if quantity <= 0:
-                continue
-            
-            if product.quantity < quantity:
-                return jsonify({
-                    'success': False,
-                    'message': f'Insufficient stock for {product.name}. Available: {product.quantity}'
-                })
-            
-            # Update inventory
-            product.quantity -= quantity
-            product.daily_sales += quantity
-            
-            # Record sale
-            new_sale = Sale(
-                customer="Cliente ocasional",
-                total=product.price * quantity,
-                date=datetime.utcnow(), 
-                user_id=session['user_id'],
-                product_id=product.id,
-                quantity=quantity
-            )
-            db.session.add(new_sale)
-        
-        db.session.commit()
+        user_id = session['user_id']
+
+        # Toda la venta se aplica en una sola transacción corta (o en el lote
+        # del escritor si SALES_GROUP_COMMIT está activo)
+        touched = sell_cart(items, user_id, customer)
         return jsonify({
             'success': True,
             'message': 'Sale recorded successfully',
-            'new_stock': {product.id: product.quantity for product in Product.query.all()}
+            # Solo el stock de los productos vendidos; si cambia la versión
+            # del catálogo el cliente debe recargar la lista completa
+            'new_stock': stock_levels(touched),
+            'catalog_version': DataVersion.current('catalog')
         })
         
+    except InsufficientStock as e:
+        return jsonify({
+            'success': False,
+            'message': f'Insufficient stock for {e.name}. Available: {e.available}'
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@sales_bp.route('/api/sales/batch', methods=['POST'])
+@login_required
+def api_ingest_sales():
+    """
+    Lote de carritos de una caja que estuvo sin conexión:
+    {"carts": [{"key": "<uuid>", "sold_at": "ISO 8601", "customer": ..., "items": [...]}]}
+    Se aplica en una transacción y se puede reenviar: los carritos con una clave
+    ya recibida vuelven como 'duplicate' sin volver a venderse.
+    """
+    data = request.get_json(silent=True) or {}
+    carts = data.get('carts')
+    if not isinstance(carts, list) or not carts:
+        return jsonify({'success': False, 'message': 'No carts'}), 400
+    if len(carts) > MAX_BATCH_CARTS:
+        return jsonify({'success': False,
+                        'message': f'Too many carts (max {MAX_BATCH_CARTS} per request)'}), 413
+    user_id = session['user_id']
+    try:
+        results, touched = commit_with_retry(lambda: ingest_carts(carts, user_id))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+    counts = {status: sum(1 for result in results if result['status'] == status)
+              for status in ('applied', 'duplicate', 'rejected')}
+    return jsonify({
+        'success': True,
+        **counts,
+        'results': results,
+        'new_stock': stock_levels(touched),
+        'catalog_version': DataVersion.current('catalog')
+    })
+
+@sales_bp.route('/api/sales/scan', methods=['POST'])
+@login_required
+def api_scan_sale():
+    """
+    Venta por código de barras en una sola petición: {"code": ..., "quantity": 1}.
+    La búsqueda usa el índice único de product.sku y la venta, la misma
+    transacción corta de apply_cart (o el commit agrupado, ver sales/group_commit.py).
+    """
+    try:
+        data = request.get_json() or {}
+        quantity = int(data.get('quantity', 1))
+        if quantity < 1:
+            return jsonify({'success': False, 'message': 'Invalid quantity'}), 400
+        product = product_by_code(data.get('code'))
+        if product is None:
+            return jsonify({'success': False, 'message': 'Unknown code'}), 404
+
+        user_id = session['user_id']
+        customer = data.get('customer', 'Cliente ocasional')
+        sell_cart([{'product_id': product.id, 'quantity': quantity}], user_id, customer)
+        return jsonify({
+            'success': True,
+            'message': f'Sold {quantity} x {product.name}',
+            'product': {'id': product.id, 'name': product.name},
+            'quantity': quantity,
+            'new_stock': stock_levels([product.id])
+        })
+
+    except InsufficientStock as e:
+        return jsonify({
+            'success': False,
+            'message': f'Insufficient stock for {e.name}. Available: {e.available}'
+        })
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
@@ -143,14 +217,18 @@ def api_create_sale():
 def api_delete_sale(sale_id):
     try:
         sale = Sale.query.get_or_404(sale_id)
-        product = Product.query.get(sale.product_id)
-        
-        # Restore inventory
-        product.quantity += sale.quantity
-        product.daily_sales -= sale.quantity
-        
-        db.session.delete(sale)
-        db.session.commit()
+        product_id = sale.product_id
+
+        def remove_sale():
+            # Restore inventory
+            release_stock(product_id, sale.quantity)
+            values = sale_values(sale)
+            remove_sales([values])
+            subtract_day_totals([values])
+            db.session.delete(sale)
+
+        commit_with_retry(remove_sale)
+        product = Product.query.get(product_id)
         
         return jsonify({
             'success': True,
@@ -164,38 +242,21 @@ def api_delete_sale(sale_id):
 @sales_bp.route('/sales/reset', methods=['POST'])
 @login_required
 def reset_daily_sales():
+    """Cierre del día: archiva las ventas de hoy y reinicia los contadores (ver sales/close.py)."""
     try:
-        today = datetime.utcnow().date()
-        
-        # Calcular total del día antes de eliminar
-        today_total = db.session.query(db.func.sum(Sale.total)).filter(
-            db.func.date(Sale.date) == today
-        ).scalar() or 0
-
-        # Crear registro histórico
-        if today_total > 0:
-            new_daily_record = DailySales(
-                date=today.strftime("%Y-%m-%d"),  # Convertir a string
-                total=today_total,
-                user_id=session['user_id']
-            )
-            db.session.add(new_daily_record)
+        today = current_business_day()
+        user_id = session['user_id']
+        # Primero los días anteriores que quedaron abiertos, cada uno en su transacción
+        for day in open_days(today):
+            if day != today:
+                commit_with_retry(lambda: close_day(day, user_id))
+        closed = commit_with_retry(lambda: close_day(today, user_id))
 
-        # SOLUCIÓN: Eliminar ventas del día usando synchronize_session=False
-        db.session.query(Sale).filter(
-            db.func.date(Sale.date) == today
-        ).delete(synchronize_session=False)
-
-        # Resetear contadores diarios
-        for product in Product.query.all():
-            product.daily_sales = 0
-
-        db.session.commit()
-
-        flash('✅ Contadores y ventas del día reiniciados correctamente. Total registrado: $%.2f' % today_total, 'success')
+        flash('✅ Día cerrado: %d venta(s) archivadas y contadores reiniciados. Total registrado: $%.2f'
+              % (closed.archived, closed.revenue), 'success')
         return jsonify({
             'success': True,
-            'message': 'Contadores y ventas del día reiniciados. Total registrado: $%.2f' % today_total
+            'message': 'Día cerrado. Total registrado: $%.2f' % closed.revenue
         })
 
     except Exception as e:
@@ -208,83 +269,46 @@ def reset_daily_sales():
 
 @sales_bp.route('/sales/report')
 @login_required
+@versioned('product', 'sale')
 def print_daily_report():
-    # Get products sold today (daily_sales > 0)
-    products_sold = Product.query.filter(Product.daily_sales > 0).all()
-    total_sales = sum(p.price * p.daily_sales for p in products_sold)
+    # Productos vendidos hoy, a los precios cobrados en cada venta
+    today = current_business_day()
+    totals = day_totals(today)
     
     return render_template('reports/sales/sales_report.html',
-                        products=products_sold,
-                        total=total_sales,
-                        date=datetime.now().strftime("%d/%m/%Y"))
+                        products=products_sold(today).all(),
+                        units=totals['units'],
+                        total=totals['revenue'],
+                        date=today.strftime("%d/%m/%Y"))
 
-@sales_bp.route('/sales/report/pdf')
-@login_required
-def download_sales_pdf():
-    # Obtener productos vendidos hoy
-    products_sold = Product.query.filter(Product.daily_sales > 0).all()
-    total_sales = sum(p.price * p.daily_sales for p in products_sold)
-    current_date = datetime.now().strftime("%d/%m/%Y")
+def sales_report(args=None):
+    """Reporte de ventas del día (ver reports/engine.py)."""
+    # Productos vendidos hoy, a los precios cobrados en cada venta
+    today = current_business_day()
+    total_sales = day_totals(today)['revenue']
+    current_date = today.strftime("%d/%m/%Y")
     
     # Obtener configuración de la empresa
     settings = get_system_settings()
     company_name = settings.company_name if settings else "Tradyx"
     
-    # Crear buffer para el PDF
-    buffer = BytesIO()
-    
-    # Crear documento PDF
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Contenido del PDF
-    elements = []
-    
-    # Título con nombre de la empresa
-    elements.append(Paragraph(f"{company_name}", styles['Title']))
-    elements.append(Paragraph(f"Reporte de Ventas - {current_date}", styles['Heading2']))
-    elements.append(Paragraph(" ", styles['Normal']))  # Espacio
-    
-    # Datos de la tabla
-    data = [["#", "Producto", "Cantidad", "Precio Unit.", "Subtotal"]]
-    
-    for idx, product in enumerate(products_sold, 1):
-        data.append([
-            str(idx),
-            product.name,
-            str(product.daily_sales),
-            f"${product.price:.2f}",
-            f"${product.price * product.daily_sales:.2f}"
-        ])
-    
-    # Total
-    data.append(["", "", "", "Total:", f"${total_sales:.2f}"])
-    
-    # Crear tabla
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, -1), (-2, -1), colors.lightgrey),
-        ('BACKGROUND', (-1, -1), (-1, -1), colors.grey),
-        ('TEXTCOLOR', (-1, -1), (-1, -1), colors.whitesmoke),
-    ]))
-    
-    elements.append(table)
-    
-    # Generar PDF
-    doc.build(elements)
-    
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"reporte_ventas_{current_date.replace('/', '-')}.pdf",
-        mimetype='application/pdf'
-    )
\ No newline at end of file
+    return {
+        'company': company_name,
+        'title': f"Reporte de Ventas - {current_date}",
+        'filename': f"reporte_ventas_{current_date.replace('/', '-')}",
+        'numbered': True,
+        'columns': [
+            ("Producto", lambda row: row.Product.name, None),
+            ("Cantidad", lambda row: row.units, None),
+            ("Precio Unit.", lambda row: row.revenue / row.units if row.units else row.Product.price, money),
+            ("Subtotal", lambda row: row.revenue, money),
+        ],
+        'rows': products_sold(today).yield_per(YIELD_PER),
+        'total_row': ["", "", "", "Total:", money(total_sales)],
+    }
+
+@sales_bp.route('/sales/report/pdf')
+@login_required
+@versioned('product', 'sale')
+def download_sales_pdf():
+    return report_response(sales_report(request.args), 'pdf')
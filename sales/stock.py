@@ -0,0 +1,155 @@
+import time
+from datetime import datetime
+from sqlalchemy import update, select, insert, func
+from sqlalchemy.exc import OperationalError
+from models import db, Product, Sale
+from sales.rollup import record_sales
+from sales.totals import add_day_totals
+from business_day import business_day_for, day_rule
+
+# Reintentos cuando SQLite devuelve "database is locked" / "database is busy"
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05  # segundos, se duplica en cada intento
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, name, available, requested):
+        self.product_id = product_id
+        self.name = name
+        self.available = available
+        self.requested = requested
+        super().__init__(f'Stock insuficiente de {name}. Disponible: {available}')
+
+def is_busy_error(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def reserve_stock(product_id, quantity):
+    """
+    Descuenta stock de forma atómica: la comprobación y la resta se hacen
+    en la misma sentencia UPDATE, así dos cajeros no pueden vender la misma
+    unidad aunque estén en workers distintos.
+    """
+    product_table = Product.__table__
+    result = db.session.execute(
+        update(product_table)
+        .where(product_table.c.id == product_id)
+        .where(product_table.c.quantity >= quantity)
+        .values(
+            quantity=product_table.c.quantity - quantity,
+            daily_sales=func.coalesce(product_table.c.daily_sales, 0) + quantity
+        )
+    )
+    if result.rowcount != 1:
+        row = db.session.execute(
+            select(product_table.c.name, product_table.c.quantity)
+            .where(product_table.c.id == product_id)
+        ).first()
+        if row is None:
+            raise InsufficientStock(product_id, f'#{product_id}', 0, quantity)
+        raise InsufficientStock(product_id, row.name, row.quantity, quantity)
+
+def release_stock(product_id, quantity):
+    """Devuelve stock al inventario (p. ej. al eliminar una venta)."""
+    product_table = Product.__table__
+    db.session.execute(
+        update(product_table)
+        .where(product_table.c.id == product_id)
+        .values(
+            quantity=product_table.c.quantity + quantity,
+            daily_sales=func.coalesce(product_table.c.daily_sales, 0) - quantity
+        )
+    )
+
+def apply_cart(items, user_id, customer='Cliente ocasional', when=None):
+    """
+    Aplica un carrito completo dentro de la transacción actual:
+    carga todos los productos con un único IN (...), descuenta el stock
+    de forma atómica e inserta todas las ventas con un solo executemany.
+    Devuelve los ids de los productos tocados.
+    """
+    return apply_cart_rows(items, user_id, customer, when)[0]
+
+def apply_cart_rows(items, user_id, customer='Cliente ocasional', when=None, aggregate=True, rule=None):
+    """
+    Como apply_cart, pero devuelve (ids de productos, filas de venta insertadas).
+    `when` es la hora UTC de la venta (por defecto, ahora). Con aggregate=False
+    no se actualizan el rollup ni day_totals: quien llama debe pasar las filas a
+    record_sales y add_day_totals (así un lote de carritos los actualiza una vez).
+    `rule` es business_day.day_rule(); quien aplica varios carritos en SAVEPOINT
+    lo resuelve una vez antes de abrir la transacción.
+    """
+    # Antes de cualquier escritura: leer los ajustes puede tocar la sesión
+    rule = rule or day_rule()
+    lines = []
+    for item in items:
+        quantity = int(item['quantity'])
+        if quantity > 0:
+            lines.append((int(item['product_id']), quantity))
+    if not lines:
+        return [], []
+
+    product_ids = sorted({product_id for product_id, _ in lines})
+    product_table = Product.__table__
+    prices = dict(db.session.execute(
+        select(product_table.c.id, product_table.c.price)
+        .where(product_table.c.id.in_(product_ids))
+    ).all())
+
+    # Agrupar por producto para hacer una sola reserva por artículo
+    requested = {}
+    for product_id, quantity in lines:
+        if product_id not in prices:
+            raise InsufficientStock(product_id, f'#{product_id}', 0, quantity)
+        requested[product_id] = requested.get(product_id, 0) + quantity
+    for product_id in product_ids:
+        reserve_stock(product_id, requested[product_id])
+
+    now = when or datetime.utcnow()
+    day = business_day_for(now, rule)
+    rows = [
+        {
+            'customer': customer,
+            'total': prices[product_id] * quantity,
+            'date': now,
+            'business_day': day,
+            'user_id': user_id,
+            'product_id': product_id,
+            'quantity': quantity
+        }
+        for product_id, quantity in lines
+    ]
+    db.session.execute(insert(Sale.__table__), rows)
+    if aggregate:
+        record_sales(rows)
+        add_day_totals(rows)
+    return product_ids, rows
+
+def stock_levels(product_ids):
+    """Stock actual solo de los productos indicados."""
+    if not product_ids:
+        return {}
+    product_table = Product.__table__
+    return dict(db.session.execute(
+        select(product_table.c.id, product_table.c.quantity)
+        .where(product_table.c.id.in_(product_ids))
+    ).all())
+
+def commit_with_retry(work, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+    """
+    Ejecuta `work()` y hace commit en una única transacción corta.
+    Si SQLite está ocupado por otro escritor se deshace todo y se repite
+    con espera exponencial; cualquier otro error se propaga tras el rollback.
+    """
+    for attempt in range(retries):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if not is_busy_error(e) or attempt == retries - 1:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+        except Exception:
+            db.session.rollback()
+            raise
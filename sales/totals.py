@@ -0,0 +1,153 @@
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Sale, Product, DayTotals, DayClose
+from sales.archive import all_sales
+from business_day import current_business_day
+
+# Totales del día de negocio (ingresos, unidades y número de ventas) guardados
+# en day_totals y actualizados en la misma transacción que cada venta o baja,
+# con el importe cobrado en ese momento. El encabezado de ventas es una lectura
+# por clave primaria y un cambio de precio posterior no altera lo ya vendido.
+
+def _aggregate(sales, sign):
+    days = {}
+    for sale in sales:
+        revenue, units, count = days.get(sale['business_day'], (0.0, 0, 0))
+        days[sale['business_day']] = (revenue + sign * sale['total'],
+                                      units + sign * sale['quantity'],
+                                      count + sign)
+    return [
+        {'business_day': day, 'revenue': revenue, 'units': units, 'sale_count': count}
+        for day, (revenue, units, count) in days.items()
+    ]
+
+def _apply(rows):
+    if not rows:
+        return
+    table = DayTotals.__table__
+    stmt = sqlite_insert(table)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.business_day],
+        set_={
+            'revenue': table.c.revenue + stmt.excluded.revenue,
+            'units': table.c.units + stmt.excluded.units,
+            'sale_count': table.c.sale_count + stmt.excluded.sale_count,
+        }
+    ), rows)
+    # Solo una resta puede vaciar un día: se borran únicamente esos días
+    emptied = [row['business_day'] for row in rows if row['sale_count'] < 0]
+    if emptied:
+        db.session.execute(empty_days_delete(emptied))
+
+def empty_days_delete(days):
+    """DELETE de los días `days` que se quedaron sin ventas."""
+    table = DayTotals.__table__
+    return table.delete().where(table.c.business_day.in_(days), table.c.sale_count <= 0)
+
+def add_day_totals(sales):
+    """
+    Suma ventas recién insertadas, dentro de la misma transacción.
+    `sales` son dicts con business_day, quantity y total (como en sales/rollup.py).
+    """
+    _apply(_aggregate(sales, 1))
+
+def subtract_day_totals(sales):
+    """Resta ventas eliminadas, dentro de la misma transacción."""
+    _apply(_aggregate(sales, -1))
+
+def sale_days(**criteria):
+    """
+    Días de negocio con ventas (abiertas o archivadas) que cumplen `criteria`,
+    p. ej. user_id=3. Se consulta antes de un borrado masivo.
+    """
+    source = all_sales()
+    query = select(source.c.business_day).where(
+        *[source.c[name] == value for name, value in criteria.items()]
+    ).distinct()
+    return [day for day, in db.session.execute(query)]
+
+def rebuild_day_totals(days=None):
+    """
+    Recalcula day_totals desde las ventas (abiertas y archivadas) para los días
+    indicados (todos si no se indican). Para borrados masivos o cambios de zona
+    horaria. No hace commit.
+    """
+    table = DayTotals.__table__
+    sale_table = all_sales()
+    delete, source = table.delete(), select(
+        sale_table.c.business_day,
+        func.sum(sale_table.c.total),
+        func.sum(sale_table.c.quantity),
+        func.count()
+    ).where(sale_table.c.business_day.isnot(None))
+    if days is not None:
+        if not days:
+            return
+        delete = delete.where(table.c.business_day.in_(days))
+        source = source.where(sale_table.c.business_day.in_(days))
+    db.session.execute(delete)
+    db.session.execute(table.insert().from_select(
+        ['business_day', 'revenue', 'units', 'sale_count'],
+        source.group_by(sale_table.c.business_day)
+    ))
+
+def day_totals(day):
+    """Totales del día (ceros si todavía no hay ventas): una lectura por clave primaria."""
+    table = DayTotals.__table__
+    row = db.session.execute(
+        select(table.c.revenue, table.c.units, table.c.sale_count)
+        .where(table.c.business_day == day)
+    ).first()
+    if row is None:
+        return {'revenue': 0.0, 'units': 0, 'sale_count': 0}
+    return dict(row._mapping)
+
+def sales_by_product_query(start, end=None, product_ids=None):
+    """Consulta agrupada (product_id, unidades, importe) de los días [start, end]."""
+    end = end or start
+    # El día actual (y los no cerrados) están en sale; los cerrados, en el archivo
+    source = Sale.__table__ if start == end and not _is_closed(start) else all_sales()
+    query = select(
+        source.c.product_id,
+        func.sum(source.c.quantity),
+        func.sum(source.c.total)
+    ).where(source.c.business_day >= start, source.c.business_day <= end)
+    if product_ids is not None:
+        query = query.where(source.c.product_id.in_(product_ids))
+    return query.group_by(source.c.product_id)
+
+def sales_by_product(product_ids=None, start=None, end=None):
+    """
+    Unidades e importe vendidos por producto en los días de negocio [start, end]
+    (por defecto, hoy) con una sola consulta agrupada, sea cual sea el tamaño del
+    catálogo. Devuelve {product_id: {'units': ..., 'revenue': ...}}; los productos
+    sin ventas no aparecen. Los rangos que incluyen días cerrados leen también el archivo.
+    """
+    if product_ids is not None and not product_ids:
+        return {}
+    rows = db.session.execute(
+        sales_by_product_query(start or current_business_day(), end, product_ids)
+    )
+    return {product_id: {'units': units, 'revenue': revenue} for product_id, units, revenue in rows}
+
+def _is_closed(day):
+    return db.session.execute(
+        select(DayClose.business_day).where(DayClose.business_day == day)
+    ).first() is not None
+
+def products_sold(day):
+    """
+    (producto, unidades, importe) vendidos en el día, a los precios cobrados.
+    Una consulta agrupada sobre el índice de business_day. Tras un cierre, las
+    ventas del día están en el archivo (y las posteriores, en sale): se lee la
+    unión para que las líneas sumen lo mismo que day_totals.
+    """
+    source = all_sales() if _is_closed(day) else Sale.__table__
+    return db.session.query(
+        Product,
+        func.sum(source.c.quantity).label('units'),
+        func.sum(source.c.total).label('revenue')
+    ).join(source, source.c.product_id == Product.id) \
+        .filter(source.c.business_day == day) \
+        .group_by(Product.id) \
+        .order_by(Product.name)
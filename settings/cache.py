@@ -0,0 +1,44 @@
+import threading
+from flask import current_app
+from models import db, SystemSettings, DataVersion
+from stamps import read_stamp, write_stamp
+
+# Copia de SystemSettings en memoria de cada worker. Los workers se enteran de
+# un cambio comparando el sello del archivo SETTINGS_VERSION_FILE (un stat, sin
+# consultas); quien modifica los ajustes lo reescribe con settings_changed().
+_lock = threading.Lock()
+_cache = {'stamp': None, 'settings': None}
+
+class CachedSettings:
+    """Instantánea desacoplada de la sesión, con los mismos atributos que SystemSettings."""
+    def __init__(self, settings):
+        for column in SystemSettings.__table__.columns:
+            setattr(self, column.key, getattr(settings, column.key))
+        self.background_filename = getattr(settings, 'background_filename', '')
+
+def _version_file():
+    return current_app.config.get('SETTINGS_VERSION_FILE')
+
+def cached_settings():
+    stamp = read_stamp(_version_file())
+    if stamp is not None and _cache['settings'] is not None and _cache['stamp'] == stamp:
+        return _cache['settings']
+    with _lock:
+        if stamp is None or _cache['stamp'] != stamp or _cache['settings'] is None:
+            # Solo lectura: se llama dentro de transacciones de venta (incluso en
+            # SAVEPOINT) y un commit aquí las cortaría. Sin fila, los valores por
+            # defecto; la fila la crean init-db o la página de ajustes
+            settings = SystemSettings.query.first() or SystemSettings.defaults()
+            _cache['settings'] = CachedSettings(settings)
+            _cache['stamp'] = stamp
+        return _cache['settings']
+
+def settings_changed():
+    """
+    Llamar después de guardar cambios en SystemSettings: incrementa la versión
+    y reescribe el archivo de sello para que todos los workers recarguen.
+    """
+    DataVersion.bump('settings')
+    db.session.commit()
+    _cache['settings'] = None
+    write_stamp(_version_file(), DataVersion.current('settings'))
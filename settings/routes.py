@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, flash, jsonify, session, redirect, url_for
 from models import db, SystemSettings, User, Product
 from auth.routes import login_required, role_required
+from settings.cache import settings_changed
+from sales.totals import rebuild_day_totals
+from business_day import day_rule, valid_timezone, timezone_choices, recompute_business_days
 import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
@@ -29,6 +32,7 @@ def settings():
                          settings=settings,
                          users_count=users_count,
                          products_count=products_count,
+                         timezones=timezone_choices(),
                          user_role=session.get('role'))
 
 @settings_bp.route('/settings/update', methods=['POST'])
@@ -43,6 +47,17 @@ def update_settings():
         settings.currency = request.form.get('currency', '$')
         settings.date_format = request.form.get('date_format', 'dd/mm/yyyy')
         settings.language = request.form.get('language', 'es')
+
+        # Día de negocio: zona horaria y hora de corte
+        old_rule = (settings.timezone, settings.day_cutover_hour)
+        timezone = request.form.get('timezone', settings.timezone or 'UTC').strip()
+        cutover = request.form.get('day_cutover_hour', settings.day_cutover_hour or 0, type=int)
+        if not valid_timezone(timezone):
+            raise ValueError(f'Zona horaria desconocida: {timezone}')
+        if not 0 <= cutover <= 23:
+            raise ValueError('La hora de corte debe estar entre 0 y 23')
+        settings.timezone = timezone
+        settings.day_cutover_hour = cutover
         
         # Manejar la carga del icono
         if 'icon_file' in request.files:
@@ -89,6 +104,12 @@ def update_settings():
                 flash('Formato de archivo no permitido para el fondo', 'danger')
         
         db.session.commit()
+        settings_changed()
+        if (settings.timezone, settings.day_cutover_hour) != old_rule:
+            updated = recompute_business_days(day_rule(settings))
+            rebuild_day_totals()
+            db.session.commit()
+            flash(f'Día de negocio recalculado en {updated} registro(s)', 'info')
         flash('Configuraciones actualizadas correctamente', 'success')
         
     except Exception as e:
@@ -116,6 +137,7 @@ def reset_background():
         # Resetear a valor por defecto (vacío)
         settings.background_filename = ''
         db.session.commit()
+        settings_changed()
         
         flash('Fondo de pantalla restaurado al valor por defecto', 'success')
         
@@ -139,6 +161,9 @@ def reset_factory_settings():
         settings.language = 'es'
         settings.icon_filename = 'images/icons8-circulacion-de-dinero-100.png'
         settings.background_filename = ''  # Resetear fondo también
+        old_rule = (settings.timezone, settings.day_cutover_hour)
+        settings.timezone = 'UTC'
+        settings.day_cutover_hour = 0
         
         # Limpiar archivos de iconos y fondos subidos (opcional)
         try:
@@ -152,6 +177,11 @@ def reset_factory_settings():
             print(f"Error al limpiar archivos: {e}")
         
         db.session.commit()
+        settings_changed()
+        if (settings.timezone, settings.day_cutover_hour) != old_rule:
+            recompute_business_days(day_rule(settings))
+            rebuild_day_totals()
+            db.session.commit()
         flash('Configuración restaurada a valores de fábrica correctamente', 'success')
         
     except Exception as e:
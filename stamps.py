@@ -0,0 +1,23 @@
+# stamps.py
+# Sellos de versión compartidos entre workers de gunicorn mediante un archivo:
+# leerlos cuesta un stat() y ninguna consulta; escribirlos crea un inodo nuevo.
+import os
+
+def read_stamp(path):
+    """Sello actual del archivo (0 si aún no existe, None si no hay ruta configurada)."""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def write_stamp(path, value):
+    if not path:
+        return
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(str(value))
+    # os.replace crea un inodo nuevo: el sello cambia aunque el mtime coincida
+    os.replace(temp_path, path)
@@ -0,0 +1,71 @@
+/* Búsqueda de productos mientras se escribe.
+   Los campos con data-product-search consultan /api/products/search y
+   muestran las coincidencias con precio y stock; al elegir una se envía
+   el formulario con ese nombre. Sin JavaScript el formulario funciona igual. */
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-product-search]').forEach(input => {
+        const list = document.createElement('ul');
+        list.className = 'search-suggestions';
+        input.parentNode.appendChild(list);
+        input.setAttribute('autocomplete', 'off');
+
+        let timer = null;
+        let lastQuery = null;
+        let controller = null;
+
+        const clear = () => {
+            list.innerHTML = '';
+            list.style.display = 'none';
+        };
+
+        const render = (products) => {
+            list.innerHTML = '';
+            products.forEach(product => {
+                const item = document.createElement('li');
+                const name = document.createElement('span');
+                name.className = 'suggestion-name';
+                name.textContent = product.name;
+                const details = document.createElement('span');
+                details.className = 'suggestion-details';
+                details.textContent = `$${product.price.toFixed(2)} · Stock: ${product.quantity} ${product.unit_measure || ''}`;
+                item.appendChild(name);
+                item.appendChild(details);
+                item.addEventListener('mousedown', function(e) {
+                    e.preventDefault();
+                    input.value = product.name;
+                    clear();
+                    input.form.submit();
+                });
+                list.appendChild(item);
+            });
+            list.style.display = products.length ? 'block' : 'none';
+        };
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (!query) {
+                lastQuery = null;
+                clear();
+                return;
+            }
+            timer = setTimeout(() => {
+                if (query === lastQuery) return;
+                lastQuery = query;
+                // Solo importa la respuesta a la última tecla pulsada
+                if (controller) controller.abort();
+                controller = new AbortController();
+                const url = `${input.dataset.productSearch}?q=${encodeURIComponent(query)}`;
+                fetch(url, { signal: controller.signal })
+                    .then(response => response.json())
+                    .then(data => data.success ? render(data.products) : clear())
+                    .catch(() => {});
+            }, 150);
+        });
+
+        input.addEventListener('blur', clear);
+        input.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') clear();
+        });
+    });
+});
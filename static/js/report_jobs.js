@@ -0,0 +1,42 @@
+/* Descarga de reportes en segundo plano.
+   Los enlaces con data-report-job encolan el reporte, consultan su estado
+   y descargan el archivo cuando está listo. Sin JavaScript, el href normal
+   sigue generando el PDF en la misma petición. */
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('a[data-report-job]').forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+            if (link.dataset.busy) return;
+            link.dataset.busy = '1';
+            const originalText = link.textContent;
+            link.textContent = '⏳ Generando...';
+
+            const finish = () => {
+                delete link.dataset.busy;
+                link.textContent = originalText;
+            };
+
+            const poll = (job) => {
+                if (job.status === 'done') {
+                    finish();
+                    window.location.href = job.download_url;
+                } else if (job.status === 'pending') {
+                    setTimeout(() => {
+                        fetch(job.status_url)
+                            .then(response => response.json())
+                            .then(poll)
+                            .catch(finish);
+                    }, 1000);
+                } else {
+                    finish();
+                    alert(job.message || 'Error al generar el reporte');
+                }
+            };
+
+            fetch(link.dataset.reportJob, { method: 'POST' })
+                .then(response => response.json())
+                .then(job => job.success ? poll(job) : (finish(), alert(job.message)))
+                .catch(finish);
+        });
+    });
+});
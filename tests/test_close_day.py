@@ -0,0 +1,89 @@
+# tests/test_close_day.py
+# Cierre del día y ventas posteriores: las líneas del reporte (sale y archivo)
+# deben sumar lo mismo que el encabezado (day_totals).
+#
+#   python -m unittest discover tests   (o python -m pytest -q tests)
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app
+from models import db, init_db, Product
+from business_day import current_business_day
+from sales.routes import sales_report
+from sales.totals import day_totals, products_sold
+
+def scratch_config(path):
+    database = os.path.join(path, 'test.db')
+    return {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database,
+        'SETTINGS_VERSION_FILE': database + '.settings-version',
+        'PERMISSIONS_VERSION_FILE': database + '.permissions-version',
+        'REPORT_CACHE_DIR': os.path.join(path, 'report_cache'),
+        'METRICS_DIR': database + '.metrics',
+        'MIGRATIONS': False,
+    }
+
+class CloseDayReportTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix='test_close_day_')
+        self.app = create_app(scratch_config(self.path))
+        init_db(self.app)
+        with self.app.app_context():
+            product = Product(name='Café', price=2.0, quantity=100)
+            db.session.add(product)
+            db.session.commit()
+            self.product_id = product.id
+        self.client = self.app.test_client()
+        self.client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def sell(self, quantity):
+        response = self.client.post('/api/sales', json={
+            'items': [{'product_id': self.product_id, 'quantity': quantity}]
+        })
+        self.assertTrue(response.get_json()['success'])
+
+    def close_day(self):
+        self.assertTrue(self.client.post('/sales/reset').get_json()['success'])
+
+    def assert_lines_match_totals(self, units, revenue):
+        with self.app.test_request_context():
+            day = current_business_day()
+            totals = day_totals(day)
+            lines = products_sold(day).all()
+            report = sales_report()
+            report_rows = list(report['rows'])
+        self.assertEqual((totals['units'], totals['revenue']), (units, revenue))
+        self.assertEqual(sum(line.units for line in lines), units)
+        self.assertAlmostEqual(sum(line.revenue for line in lines), revenue)
+        self.assertAlmostEqual(sum(row.revenue for row in report_rows), revenue)
+
+        page = self.client.get('/sales/report').get_data(as_text=True)
+        self.assertNotIn('No hay ventas', page)
+        self.assertIn(f'<td>{units}</td>', page)
+
+    def test_report_after_close(self):
+        self.sell(3)
+        self.close_day()
+        # Justo después del cierre las ventas están en el archivo
+        self.assert_lines_match_totals(3, 6.0)
+        self.sell(1)
+        self.assert_lines_match_totals(4, 8.0)
+
+    def test_report_after_two_closes(self):
+        self.sell(2)
+        self.close_day()
+        self.sell(1)
+        self.close_day()
+        self.sell(1)
+        self.assert_lines_match_totals(4, 8.0)
+
+if __name__ == '__main__':
+    unittest.main()
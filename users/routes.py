@@ -1,9 +1,29 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify
-from models import db, User, Sale
+from models import db, User, Sale, SalesRollup
+from sales.totals import sale_days, rebuild_day_totals
+from sales.archive import delete_archived_sales
 from auth.routes import login_required, role_required
+from auth.permissions import revoke_user_permissions
+from listing import ListSpec, list_page, page_json, contains
 
 users_bp = Blueprint('users', __name__)
 
+ROLES = ('admin', 'dependiente')
+
+def _user_search(text):
+    # Búsqueda case-insensitive por nombre de usuario o rol
+    return contains(User.username, text) | contains(User.role, text)
+
+# Sin la columna password: el listado no necesita los hashes
+USER_LIST = ListSpec(
+    User,
+    columns=['id', 'username', 'role'],
+    sorts={'role': (User.role, User.username), 'username': (User.username,)},
+    default_sort='role',
+    filters={'role': lambda value: User.role == value if value in ROLES else None},
+    search=_user_search,
+)
+
 @users_bp.route('/users', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
@@ -27,29 +47,24 @@ def users():
                 flash(f'Error al crear usuario: {str(e)}', 'danger')
         return redirect(url_for('users.users'))
     
-    # Obtener parámetro de búsqueda
-    search_query = request.args.get('search', '').strip()
-    
-    if search_query:
-        # Filtrar usuarios por nombre de usuario o rol (búsqueda case-insensitive)
-        users = User.query.filter(
-            User.username.ilike(f'%{search_query}%') |
-            User.role.ilike(f'%{search_query}%')
-        ).order_by(User.role, User.username).all()
-    else:
-        users = User.query.order_by(User.role, User.username).all()
+    users = list_page(USER_LIST)
     
-    # Organizar usuarios por rol para la vista tree
-    users_by_role = {}
-    for user in users:
-        if user.role not in users_by_role:
-            users_by_role[user.role] = []
-        users_by_role[user.role].append(user)
+    # Usuarios por rol (para los contadores de la vista tree) con un GROUP BY;
+    # la página ya viene ordenada por rol y la plantilla la agrupa con groupby
+    role_counts = dict(users.query.with_entities(User.role, db.func.count(User.id))
+                       .order_by(None).group_by(User.role))
     
     return render_template('modules/users/users.html', 
                          users=users,
-                         users_by_role=users_by_role,
-                         search_query=search_query)
+                         role_counts=role_counts,
+                         search_query=users.params['search'])
+
+@users_bp.route('/api/users')
+@login_required
+@role_required('admin')
+def api_users():
+    """Página de usuarios en JSON (?after=<cursor>&size=&sort=&role=&search=)."""
+    return jsonify(page_json(list_page(USER_LIST)))
 
 @users_bp.route('/users/delete/<int:user_id>')
 @login_required
@@ -60,9 +75,14 @@ def delete_user(user_id):
     else:
         user = User.query.get_or_404(user_id)
         try:
+            days = sale_days(user_id=user_id)
             Sale.query.filter_by(user_id=user_id).delete()
+            delete_archived_sales(user_id=user_id)
+            SalesRollup.query.filter_by(user_id=user_id).delete()
+            rebuild_day_totals(days)
             db.session.delete(user)
             db.session.commit()
+            revoke_user_permissions(user_id)
             flash('Usuario eliminado correctamente', 'success')
         except Exception as e:
             db.session.rollback()